@@ -1,34 +1,225 @@
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes  # Import hashes module for SHA-256
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 import os
+import asyncio
+import base64
 import binascii
+import io
+import itertools
+import threading
+import struct
 import re
 import sys
 
 
+# Hash algorithms that may be used by PBKDF2 to derive the AES key
+KDF_ALGORITHMS = {
+    'sha256': hashes.SHA256,
+    'sha512': hashes.SHA512,
+}
+
+KDF_ALGORITHM_IDS = {'sha256': 1, 'sha512': 2}  # KDF algorithm identifiers stored in the envelope
+
+DEFAULT_CHUNK_SIZE = 64 * 1024  # Number of bytes read at a time by the streaming helpers
+DEFAULT_BATCH_WINDOW = 1024  # Number of records decrypt_many() parses ahead to group key derivations
+
+# Binary envelope layout: header, salt, IV, then ciphertext
+# Header fields: magic, version, cipher mode, KDF algorithm id, KDF iterations, salt length, IV length
+ENVELOPE_MAGIC = b'AESX'
+ENVELOPE_VERSION = 1
+ENVELOPE_HEADER = struct.Struct('>4sBBBIBB')
+MODE_CFB = 1
+MODE_GCM = 2
+CIPHER_MODES = {'cfb': MODE_CFB, 'gcm': MODE_GCM}  # Cipher mode names accepted by AESCipher
+
+# Segmented AES-GCM layout: envelope header (whose IV is a 7-byte nonce prefix), 4-byte segment size,
+# then segments of ciphertext + 16-byte tag. Each segment nonce is prefix + segment index + final flag,
+# and the header is authenticated with every segment, so reordering, truncation and tampering are detected.
+DEFAULT_SEGMENT_SIZE = 1024 * 1024
+GCM_NONCE_PREFIX_SIZE = 7
+GCM_TAG_SIZE = 16
+SEGMENT_SIZE_FIELD = struct.Struct('>I')
+SEGMENT_NONCE_SUFFIX = struct.Struct('>IB')  # Segment index, final-segment flag
+
+TEXT_ENCODINGS = ('hex', 'base64', None)  # Text encodings offered for envelopes (None returns raw bytes)
+LEGACY_HEADER_SIZE = 32  # Legacy layout: 16-byte salt followed by 16-byte IV
+
+
 class AESCipher:
-    def __init__(self, password):
+    def __init__(self, password, key_cache_size=32, iterations=100000, kdf_algorithm='sha256',
+                 cipher_mode='cfb', segment_size=DEFAULT_SEGMENT_SIZE, workers=None,
+                 executor=None, kdf_executor=None, max_concurrency=None):
+        """
+        Initialize AESCipher with a password and a bounded derived-key cache.
+
+        :param password: Password used to derive the encryption key.
+        :param key_cache_size: Maximum number of derived keys kept in memory (0 disables caching).
+        :param iterations: Number of PBKDF2 iterations used for new encryptions.
+        :param kdf_algorithm: Hash algorithm used by PBKDF2 for new encryptions.
+        :param cipher_mode: 'cfb' for the classic single-stream mode, or 'gcm' for independently
+                            authenticated segments that are processed in parallel.
+        :param segment_size: Plaintext bytes per segment in 'gcm' mode.
+        :param workers: Number of worker processes used in 'gcm' mode (defaults to the CPU count).
+        :param executor: Executor running the async API's cipher work (defaults to the event loop's executor).
+        :param kdf_executor: Executor running the async API's PBKDF2 work (defaults to executor); a process
+                             pool may be used.
+        :param max_concurrency: Maximum number of async jobs submitted to the executors at once.
+        """
+        if kdf_algorithm not in KDF_ALGORITHMS:
+            raise ValueError(f"Unsupported KDF algorithm '{kdf_algorithm}'.")
+        if key_cache_size < 0:
+            raise ValueError("Key cache size must not be negative.")
+        if cipher_mode not in CIPHER_MODES:
+            raise ValueError(f"Unsupported cipher mode '{cipher_mode}'.")
+        if not 0 < segment_size < 2 ** 31:
+            raise ValueError("Segment size must be between 1 byte and 2 GiB.")
+
         self.password = password.encode('utf-8')
         self.salt = os.urandom(16)  # Generate a random salt
+        self.iterations = iterations
+        self.kdf_algorithm = kdf_algorithm
+        self.key_cache_size = key_cache_size
+        self._key_cache = OrderedDict()  # (salt, iterations, algorithm) -> derived key, in LRU order
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cipher_mode = cipher_mode
+        self.segment_size = segment_size
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.kdf_executor = kdf_executor or executor
+        self.max_concurrency = max_concurrency or self.workers
+        self._cache_lock = threading.RLock()  # The cache is shared with executor threads used by the async API
+        # Event loop -> (semaphore, {cache key -> in-flight derivation}). Both are bound to the loop that created
+        # them, so each loop gets its own and the cipher can be used across asyncio.run() calls and threads.
+        self._loop_state = {}
+        self._segment_pool = None  # Process pool for 'gcm' segments, created on first use and reused until close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Wipe every cached key from memory, empty the cache and shut down the segment process pool.
+        """
+        with self._cache_lock:
+            while self._key_cache:
+                _, key = self._key_cache.popitem(last=False)
+                self._wipe(key)
+            pool, self._segment_pool = self._segment_pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def cache_stats(self):
+        """
+        Return the derived-key cache counters.
+
+        :return: Dictionary with the number of hits, misses and currently cached keys.
+        """
+        return {'hits': self.cache_hits, 'misses': self.cache_misses, 'size': len(self._key_cache)}
+
+    def _derive_key(self, salt, iterations=None, algorithm=None):
+        """
+        Derive the AES key for the given salt, reusing a cached key when one is available.
+
+        :param salt: Salt used by PBKDF2.
+        :param iterations: Number of PBKDF2 iterations (defaults to the instance setting).
+        :param algorithm: Hash algorithm name from KDF_ALGORITHMS (defaults to the instance setting).
+        :return: The 32-byte derived key.
+        """
+        iterations = self.iterations if iterations is None else iterations
+        algorithm = self.kdf_algorithm if algorithm is None else algorithm
+        if algorithm not in KDF_ALGORITHMS:
+            raise ValueError(f"Unsupported KDF algorithm '{algorithm}'.")
+
+        cache_key = (bytes(salt), iterations, algorithm)
+        cached = self._lookup_key(cache_key)
+        if cached is not None:
+            return cached
+
+        key = _derive_key_worker(self.password, cache_key[0], iterations, algorithm)
+        self._remember_key(cache_key, key)
+        return key
+
+    def _lookup_key(self, cache_key):
+        # Return a cached key (marking it most recently used) or None, updating the hit counter
+        with self._cache_lock:
+            cached = self._key_cache.get(cache_key)
+            if cached is None:
+                return None
+            self._key_cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            return bytes(cached)
+
+    def _remember_key(self, cache_key, key):
+        # Count a freshly derived key and cache it, wiping the least recently used keys beyond the size limit
+        with self._cache_lock:
+            self.cache_misses += 1
+            if self.key_cache_size:
+                self._key_cache[cache_key] = bytearray(key)
+                while len(self._key_cache) > self.key_cache_size:
+                    _, evicted = self._key_cache.popitem(last=False)
+                    self._wipe(evicted)
+
+    def _derive_keys(self, cache_keys, pool):
+        # Resolve several (salt, iterations, algorithm) keys, deriving the uncached ones once each on the pool
+        keys = {}
+        missing = []
+        for cache_key in dict.fromkeys(cache_keys):
+            cached = self._lookup_key(cache_key)
+            if cached is not None:
+                keys[cache_key] = cached
+            else:
+                missing.append(cache_key)
 
-    def encrypt(self, plaintext):
+        if len(missing) > 1 and pool is not None:
+            derived = pool.map(_derive_key_worker, itertools.repeat(self.password), *zip(*missing))
+        else:
+            derived = (_derive_key_worker(self.password, *cache_key) for cache_key in missing)
+        for cache_key, key in zip(missing, derived):
+            self._remember_key(cache_key, key)
+            keys[cache_key] = key
+        return keys
+
+    @staticmethod
+    def _wipe(key):
+        # Overwrite the cached key in place so it does not linger in memory after eviction
+        for index in range(len(key)):
+            key[index] = 0
+
+    def encrypt_bytes(self, data):
+        """
+        Encrypt raw bytes and return them wrapped in a binary envelope.
+
+        :param data: Bytes-like plaintext.
+        :return: Envelope bytes holding the KDF parameters, salt, IV and ciphertext.
+        """
         try:
-            # Generate key from password and salt using PBKDF2
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=self.salt,
-                iterations=100000,
-                backend=default_backend()
-            )
-            key = kdf.derive(self.password)
+            key = self._derive_key(self.salt)
+        except (ValueError, TypeError) as e:
+            raise RuntimeError(f"Encryption failed: {str(e)}")
+        return self._encrypt_record(key, data)
+
+    def _encrypt_record(self, key, data):
+        # Encrypt one record with an already derived key under a fresh IV or nonce prefix
+        if self.cipher_mode == 'gcm':
+            destination = io.BytesIO()
+            self._encrypt_segments(data, destination, key)
+            return destination.getvalue()
 
+        try:
             # Pad the plaintext to be a multiple of 16 bytes (AES block size)
             padder = padding.PKCS7(algorithms.AES.block_size).padder()
-            padded_plaintext = padder.update(plaintext.encode('utf-8')) + padder.finalize()
+            padded_plaintext = padder.update(data) + padder.finalize()
 
             # Generate a random IV (Initialization Vector)
             iv = os.urandom(16)
@@ -38,29 +229,37 @@ class AESCipher:
             encryptor = cipher.encryptor()
             ciphertext = encryptor.update(padded_plaintext) + encryptor.finalize()
 
-            # Return salt, iv, and ciphertext as hexadecimal strings
-            return (binascii.hexlify(self.salt).decode('utf-8') + binascii.hexlify(iv).decode(
-                'utf-8') + binascii.hexlify(ciphertext).decode('utf-8'))
+            return self._build_header(MODE_CFB, iv) + ciphertext
 
         except (ValueError, TypeError) as e:
             raise RuntimeError(f"Encryption failed: {str(e)}")
 
-    def decrypt(self, encrypted_data_hex):
+    def decrypt_bytes(self, data):
+        """
+        Decrypt a binary envelope (or a legacy salt + IV + ciphertext blob) back to raw bytes.
+
+        The input is parsed through a memoryview, so salt, IV and ciphertext are not copied out of it.
+
+        :param data: Bytes-like encrypted data.
+        :return: The plaintext bytes.
+        """
         try:
-            # Split encrypted data into salt, IV, and ciphertext
-            salt = binascii.unhexlify(encrypted_data_hex[:32])
-            iv = binascii.unhexlify(encrypted_data_hex[32:64])
-            ciphertext = binascii.unhexlify(encrypted_data_hex[64:])
+            fields = parse_envelope(data)
+            _, algorithm, iterations, salt, _, _ = fields
+            return self._decrypt_record(self._derive_key(salt, iterations, algorithm), fields)
+        except (ValueError, TypeError) as e:
+            raise RuntimeError(f"Decryption failed: {str(e)}")
 
-            # Generate key from password and salt using PBKDF2
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-                backend=default_backend()
-            )
-            key = kdf.derive(self.password)
+    def _decrypt_record(self, key, fields):
+        # Decrypt one parsed envelope with an already derived key
+        mode, algorithm, iterations, salt, iv, ciphertext = fields
+        try:
+            if mode == MODE_GCM:
+                destination = io.BytesIO()
+                self._decrypt_segments(ciphertext, destination, algorithm, iterations, salt, iv, key)
+                return destination.getvalue()
+            if mode != MODE_CFB:
+                raise ValueError(f"Unsupported cipher mode {mode}.")
 
             # Decrypt the ciphertext
             cipher = Cipher(algorithms.AES(key), modes.CFB(iv), backend=default_backend())
@@ -69,13 +268,581 @@ class AESCipher:
 
             # Unpad the plaintext
             unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
-            plaintext = unpadder.update(padded_plaintext) + unpadder.finalize()
+            return unpadder.update(padded_plaintext) + unpadder.finalize()
+
+        except (ValueError, TypeError) as e:
+            raise RuntimeError(f"Decryption failed: {str(e)}")
+
+    def encrypt(self, plaintext, encoding='hex'):
+        """
+        Encrypt a string and return the envelope in the requested text encoding.
 
+        :param plaintext: Text to encrypt.
+        :param encoding: 'hex', 'base64', or None to return the raw envelope bytes.
+        :return: The encoded envelope.
+        """
+        if encoding not in TEXT_ENCODINGS:
+            raise RuntimeError(f"Encryption failed: unsupported encoding '{encoding}'.")
+        return encode_envelope(self.encrypt_bytes(plaintext.encode('utf-8')), encoding)
+
+    def decrypt(self, encrypted_data):
+        """
+        Decrypt data produced by encrypt(), detecting hex, base64, raw and legacy hex input.
+
+        :param encrypted_data: Encoded envelope string, raw envelope bytes or legacy hex string.
+        :return: The decrypted text.
+        """
+        try:
+            plaintext = self.decrypt_bytes(decode_envelope(encrypted_data))
             return plaintext.decode('utf-8')
+        except (ValueError, TypeError) as e:
+            raise RuntimeError(f"Decryption failed: {str(e)}")
+
+    def encrypt_many(self, plaintexts, encoding='hex'):
+        """
+        Encrypt many strings lazily, deriving the key once for the whole batch.
+
+        Every record gets its own random IV (or nonce prefix in 'gcm' mode) under the shared salt.
+
+        :param plaintexts: Iterable of strings to encrypt.
+        :param encoding: 'hex', 'base64', or None to yield raw envelope bytes.
+        :return: Generator of encoded envelopes in input order.
+        """
+        if encoding not in TEXT_ENCODINGS:
+            raise RuntimeError(f"Encryption failed: unsupported encoding '{encoding}'.")
+        try:
+            key = self._derive_key(self.salt)
+        except (ValueError, TypeError) as e:
+            raise RuntimeError(f"Encryption failed: {str(e)}")
+
+        for plaintext in plaintexts:
+            yield encode_envelope(self._encrypt_record(key, plaintext.encode('utf-8')), encoding)
+
+    def decrypt_many(self, records, window=DEFAULT_BATCH_WINDOW):
+        """
+        Decrypt many records lazily, yielding the plaintexts in input order.
+
+        Records are read a window at a time. The distinct salts (and KDF settings) in a window that are
+        not already cached are derived once each, spread across a process pool, so at most one window
+        of records is held in memory.
+
+        :param records: Iterable of values accepted by decrypt() (hex, base64, raw or legacy hex).
+        :param window: Number of records parsed ahead of the output.
+        :return: Generator of decrypted strings.
+        """
+        if window < 1:
+            raise ValueError("Window must be at least 1.")
+
+        records = iter(records)
+        pool = None
+        position = 0
+        try:
+            while True:
+                batch = list(itertools.islice(records, window))
+                if not batch:
+                    return
+
+                parsed = []
+                for index, record in enumerate(batch, start=position):
+                    try:
+                        parsed.append(parse_envelope(decode_envelope(record)))
+                    except (ValueError, TypeError) as e:
+                        raise RuntimeError(f"Decryption failed for record {index}: {str(e)}")
+                cache_keys = [(bytes(salt), iterations, algorithm) for _, algorithm, iterations, salt, _, _ in parsed]
+
+                if pool is None and self.workers > 1 and len(set(cache_keys)) > 1:
+                    pool = ProcessPoolExecutor(max_workers=self.workers)
+                keys = self._derive_keys(cache_keys, pool)
+
+                for index, (cache_key, fields) in enumerate(zip(cache_keys, parsed), start=position):
+                    try:
+                        yield self._decrypt_record(keys[cache_key], fields).decode('utf-8')
+                    except (ValueError, TypeError) as e:
+                        raise RuntimeError(f"Decryption failed for record {index}: {str(e)}")
+                position += len(batch)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    async def aencrypt(self, plaintext, encoding='hex'):
+        """
+        Asynchronous counterpart of encrypt() that keeps PBKDF2 and cipher work off the event loop.
+
+        :param plaintext: Text to encrypt.
+        :param encoding: 'hex', 'base64', or None to return the raw envelope bytes.
+        :return: The encoded envelope.
+        """
+        if encoding not in TEXT_ENCODINGS:
+            raise RuntimeError(f"Encryption failed: unsupported encoding '{encoding}'.")
+        key = await self._aderive_key(self.salt, self.iterations, self.kdf_algorithm)
+        envelope = await self._run_in_executor(self.executor, self._encrypt_record, key, plaintext.encode('utf-8'))
+        return encode_envelope(envelope, encoding)
+
+    async def adecrypt(self, encrypted_data):
+        """
+        Asynchronous counterpart of decrypt() that keeps PBKDF2 and cipher work off the event loop.
+
+        :param encrypted_data: Encoded envelope string, raw envelope bytes or legacy hex string.
+        :return: The decrypted text.
+        """
+        try:
+            fields = parse_envelope(decode_envelope(encrypted_data))
+        except (ValueError, TypeError) as e:
+            raise RuntimeError(f"Decryption failed: {str(e)}")
+        _, algorithm, iterations, salt, _, _ = fields
+        key = await self._aderive_key(salt, iterations, algorithm)
+        plaintext = await self._run_in_executor(self.executor, self._decrypt_record, key, fields)
+        try:
+            return plaintext.decode('utf-8')
+        except ValueError as e:
+            raise RuntimeError(f"Decryption failed: {str(e)}")
+
+    async def aencrypt_stream(self, source, destination, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Asynchronous counterpart of encrypt_stream(); the blocking stream I/O runs on the executor.
+
+        :param source: Readable binary file object holding the plaintext.
+        :param destination: Writable binary file object receiving the encrypted data.
+        :param chunk_size: Number of bytes read from the source at a time.
+        :return: Number of bytes written to the destination.
+        """
+        key = await self._aderive_key(self.salt, self.iterations, self.kdf_algorithm)
+        return await self._run_in_executor(self.executor, self._encrypt_stream, source, destination, chunk_size, key)
+
+    async def adecrypt_stream(self, source, destination, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Asynchronous counterpart of decrypt_stream(); the blocking stream I/O runs on the executor.
+
+        :param source: Readable binary file object holding the encrypted data.
+        :param destination: Writable binary file object receiving the plaintext.
+        :param chunk_size: Number of bytes read from the source at a time.
+        :return: Number of plaintext bytes written to the destination.
+        """
+        try:
+            header = await self._run_in_executor(self.executor, _read_stream_header, source)
+        except (ValueError, TypeError) as e:
+            raise RuntimeError(f"Decryption failed: {str(e)}")
+        _, algorithm, iterations, salt, _ = header
+        key = await self._aderive_key(salt, iterations, algorithm)
+        return await self._run_in_executor(self.executor, self._decrypt_stream, source, destination, chunk_size,
+                                           header, key)
+
+    async def _aderive_key(self, salt, iterations, algorithm):
+        # Derive a key without blocking the event loop; concurrent requests for the same key share one derivation
+        if algorithm not in KDF_ALGORITHMS:
+            raise RuntimeError(f"Unsupported KDF algorithm '{algorithm}'.")
+        cache_key = (bytes(salt), iterations, algorithm)
+        cached = self._lookup_key(cache_key)
+        if cached is not None:
+            return cached
+
+        _, pending_keys = self._get_loop_state()
+        pending = pending_keys.get(cache_key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._derive_pending_key(cache_key, pending_keys))
+            pending_keys[cache_key] = pending
+        # Shield the shared derivation so one cancelled caller does not cancel it for the others
+        return await asyncio.shield(pending)
+
+    async def _derive_pending_key(self, cache_key, pending_keys):
+        # Run one coalesced derivation on the KDF executor and publish the result to the cache
+        try:
+            key = await self._run_in_executor(self.kdf_executor, _derive_key_worker, self.password, *cache_key)
+        finally:
+            del pending_keys[cache_key]
+        self._remember_key(cache_key, key)
+        return key
+
+    async def _run_in_executor(self, executor, function, *args):
+        # Run blocking work on an executor while limiting how many async jobs are in flight at once
+        semaphore, _ = self._get_loop_state()
+        async with semaphore:
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+    def _get_loop_state(self):
+        # The semaphore and in-flight derivations of the running event loop, created on its first async use
+        loop = asyncio.get_running_loop()
+        with self._cache_lock:
+            state = self._loop_state.get(loop)
+            if state is None:
+                for closed in [other for other in self._loop_state if other.is_closed()]:
+                    del self._loop_state[closed]  # Forget loops that finished, such as earlier asyncio.run() calls
+                state = self._loop_state[loop] = (asyncio.Semaphore(self.max_concurrency), {})
+            return state
+
+    def _build_header(self, mode, iv):
+        # Serialize the envelope header followed by the salt and IV
+        return _envelope_header(mode, self.kdf_algorithm, self.iterations, self.salt, iv)
+
+    def encrypt_stream(self, source, destination, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Encrypt a binary stream chunk by chunk so that memory use does not grow with the input size.
+
+        The output is an envelope header (KDF parameters, salt and IV) followed by the ciphertext.
+
+        :param source: Readable binary file object holding the plaintext.
+        :param destination: Writable binary file object receiving the encrypted data.
+        :param chunk_size: Number of bytes read from the source at a time.
+        :return: Number of bytes written to the destination.
+        """
+        return self._encrypt_stream(source, destination, chunk_size)
+
+    def _encrypt_stream(self, source, destination, chunk_size, key=None):
+        # Body of encrypt_stream(), optionally using a key that was already derived
+        if self.cipher_mode == 'gcm':
+            return self._encrypt_segments(source, destination, key)
+
+        try:
+            key = key or self._derive_key(self.salt)
+            iv = os.urandom(16)
+            encryptor = Cipher(algorithms.AES(key), modes.CFB(iv), backend=default_backend()).encryptor()
+            padder = padding.PKCS7(algorithms.AES.block_size).padder()
+
+            header = self._build_header(MODE_CFB, iv)
+            destination.write(header)
+            written = len(header)
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                ciphertext = encryptor.update(padder.update(chunk))
+                destination.write(ciphertext)
+                written += len(ciphertext)
+
+            ciphertext = encryptor.update(padder.finalize()) + encryptor.finalize()
+            destination.write(ciphertext)
+            return written + len(ciphertext)
+
+        except (ValueError, TypeError) as e:
+            raise RuntimeError(f"Encryption failed: {str(e)}")
+
+    def decrypt_stream(self, source, destination, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Decrypt a binary stream produced by encrypt_stream() chunk by chunk.
+
+        Streams without an envelope header are read as the legacy salt + IV + ciphertext layout.
+        Plaintext is written as it is recovered, so the destination may hold partial output if
+        decryption fails (for example because of a wrong password).
+
+        :param source: Readable binary file object holding the encrypted data.
+        :param destination: Writable binary file object receiving the plaintext.
+        :param chunk_size: Number of bytes read from the source at a time.
+        :return: Number of plaintext bytes written to the destination.
+        """
+        return self._decrypt_stream(source, destination, chunk_size)
+
+    def _decrypt_stream(self, source, destination, chunk_size, header=None, key=None):
+        # Body of decrypt_stream(), optionally using a header that was already read and a key already derived
+        try:
+            mode, algorithm, iterations, salt, iv = header or _read_stream_header(source)
+            if mode == MODE_GCM:
+                return self._decrypt_segments(source, destination, algorithm, iterations, salt, iv, key)
+            if mode != MODE_CFB:
+                raise ValueError(f"Unsupported cipher mode {mode}.")
+
+            key = key or self._derive_key(salt, iterations, algorithm)
+            decryptor = Cipher(algorithms.AES(key), modes.CFB(iv), backend=default_backend()).decryptor()
+            unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+
+            written = 0
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                plaintext = unpadder.update(decryptor.update(chunk))
+                destination.write(plaintext)
+                written += len(plaintext)
+
+            plaintext = unpadder.update(decryptor.finalize()) + unpadder.finalize()
+            destination.write(plaintext)
+            return written + len(plaintext)
 
         except (ValueError, TypeError) as e:
             raise RuntimeError(f"Decryption failed: {str(e)}")
 
+    def _encrypt_segments(self, source, destination, key=None):
+        # Encrypt the source (a readable file, or bytes-like data sliced without copying) as independently
+        # authenticated AES-GCM segments
+        try:
+            key = key or self._derive_key(self.salt)
+            nonce_prefix = os.urandom(GCM_NONCE_PREFIX_SIZE)
+            header = self._build_header(MODE_GCM, nonce_prefix) + SEGMENT_SIZE_FIELD.pack(self.segment_size)
+
+            destination.write(header)
+            written = len(header)
+            segments = _segments_of(source, self.segment_size)
+            for ciphertext in self._run_segments(_encrypt_segment, key, nonce_prefix, header, segments):
+                destination.write(ciphertext)
+                written += len(ciphertext)
+            return written
+
+        except (ValueError, TypeError) as e:
+            raise RuntimeError(f"Encryption failed: {str(e)}")
+
+    def _decrypt_segments(self, source, destination, algorithm, iterations, salt, nonce_prefix, key=None):
+        # Verify and decrypt AES-GCM segments that follow an already parsed envelope header; the source is a
+        # readable file, or bytes-like data sliced without copying
+        if hasattr(source, 'read'):
+            field = _read_exactly(source, SEGMENT_SIZE_FIELD.size)
+        else:
+            source = memoryview(source).cast('B')
+            field, source = bytes(source[:SEGMENT_SIZE_FIELD.size]), source[SEGMENT_SIZE_FIELD.size:]
+        if len(field) < SEGMENT_SIZE_FIELD.size:
+            raise ValueError("Envelope is truncated.")
+        segment_size, = SEGMENT_SIZE_FIELD.unpack(field)
+        header = _envelope_header(MODE_GCM, algorithm, iterations, salt, nonce_prefix) + field
+        key = key or self._derive_key(salt, iterations, algorithm)
+
+        written = 0
+        segments = _segments_of(source, segment_size + GCM_TAG_SIZE)
+        for plaintext in self._run_segments(_decrypt_segment, key, bytes(nonce_prefix), header, segments):
+            destination.write(plaintext)
+            written += len(plaintext)
+        return written
+
+    def _run_segments(self, function, key, nonce_prefix, header, segments):
+        # Apply a segment function in input order, fanning out to a process pool when there is more than one segment
+        segments = iter(segments)
+        first = next(segments)
+        if self.workers <= 1 or first[1]:
+            yield function(key, nonce_prefix, *first, header)
+            for segment in segments:
+                yield function(key, nonce_prefix, *segment, header)
+            return
+
+        # Keep at most two segments per worker in flight so memory stays bounded
+        # Memoryview slices cannot be pickled, so segments are copied once on their way to the workers
+        pool = self._get_segment_pool()
+        pending = deque([pool.submit(function, key, nonce_prefix, *first[:2], bytes(first[2]), header)])
+        try:
+            for index, is_last, data in segments:
+                pending.append(pool.submit(function, key, nonce_prefix, index, is_last, bytes(data), header))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:  # Abandoned or failed: drop the segments that have not started yet
+                future.cancel()
+
+    def _get_segment_pool(self):
+        # Start the segment process pool once per instance rather than once per call
+        with self._cache_lock:
+            if self._segment_pool is None:
+                self._segment_pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._segment_pool
+
+    def encrypt_file(self, input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Encrypt the file at input_path into output_path using encrypt_stream().
+
+        :param input_path: Path of the plaintext file.
+        :param output_path: Path of the encrypted file to create.
+        :param chunk_size: Number of bytes read from the input file at a time.
+        :return: Number of bytes written to output_path.
+        """
+        return _transform_file(self.encrypt_stream, input_path, output_path, chunk_size)
+
+    def decrypt_file(self, input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Decrypt the file at input_path into output_path using decrypt_stream().
+
+        :param input_path: Path of the encrypted file.
+        :param output_path: Path of the plaintext file to create.
+        :param chunk_size: Number of bytes read from the input file at a time.
+        :return: Number of bytes written to output_path.
+        """
+        return _transform_file(self.decrypt_stream, input_path, output_path, chunk_size)
+
+
+def parse_envelope(data):
+    """
+    Split encrypted data into its fields without copying it.
+
+    Data that does not start with the envelope magic is treated as the legacy layout
+    (16-byte salt, 16-byte IV, ciphertext) produced with the default KDF settings.
+
+    :param data: Bytes-like envelope or legacy blob.
+    :return: Tuple of (mode, KDF algorithm, iterations, salt, IV, ciphertext); salt, IV and ciphertext are memoryviews.
+    """
+    view = memoryview(data).cast('B')
+    if len(view) >= ENVELOPE_HEADER.size and view[:len(ENVELOPE_MAGIC)] == ENVELOPE_MAGIC:
+        _, version, mode, kdf_id, iterations, salt_length, iv_length = ENVELOPE_HEADER.unpack_from(view)
+        algorithm = _check_envelope_fields(version, kdf_id)
+        offset = ENVELOPE_HEADER.size
+        if len(view) < offset + salt_length + iv_length:
+            raise ValueError("Envelope is truncated.")
+        salt = view[offset:offset + salt_length]
+        iv = view[offset + salt_length:offset + salt_length + iv_length]
+        return mode, algorithm, iterations, salt, iv, view[offset + salt_length + iv_length:]
+
+    if len(view) < LEGACY_HEADER_SIZE:
+        raise ValueError("Encrypted data is too short to contain a salt and IV.")
+    return MODE_CFB, 'sha256', 100000, view[:16], view[16:LEGACY_HEADER_SIZE], view[LEGACY_HEADER_SIZE:]
+
+
+def _check_envelope_fields(version, kdf_id):
+    # Validate the envelope version and translate the stored KDF id back to its algorithm name
+    if version != ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported envelope version {version}.")
+    for name, identifier in KDF_ALGORITHM_IDS.items():
+        if identifier == kdf_id:
+            return name
+    raise ValueError(f"Unsupported KDF algorithm id {kdf_id}.")
+
+
+def encode_envelope(envelope, encoding):
+    """
+    Convert envelope bytes to the requested text encoding.
+
+    :param envelope: Envelope bytes.
+    :param encoding: 'hex', 'base64', or None to return the bytes unchanged.
+    :return: The encoded envelope.
+    """
+    if encoding == 'hex':
+        return binascii.hexlify(envelope).decode('ascii')
+    if encoding == 'base64':
+        return base64.b64encode(envelope).decode('ascii')
+    return envelope
+
+
+def decode_envelope(encrypted_data):
+    """
+    Turn hex or base64 text back into envelope bytes; bytes-like input is returned unchanged.
+
+    :param encrypted_data: Encoded string or bytes-like data.
+    :return: Bytes-like encrypted data suitable for parse_envelope().
+    """
+    if not isinstance(encrypted_data, str):
+        return encrypted_data
+    encrypted_data = encrypted_data.strip()
+    try:
+        return binascii.unhexlify(encrypted_data)
+    except (binascii.Error, ValueError):
+        pass
+    try:
+        return base64.b64decode(encrypted_data, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Encrypted data is neither hex nor base64 encoded.")
+
+
+def _read_stream_header(source):
+    # Read the envelope (or legacy) header from the start of an encrypted stream
+    prefix = _read_exactly(source, len(ENVELOPE_MAGIC))
+    if prefix == ENVELOPE_MAGIC:
+        header = prefix + _read_exactly(source, ENVELOPE_HEADER.size - len(prefix))
+        if len(header) < ENVELOPE_HEADER.size:
+            raise ValueError("Envelope is truncated.")
+        _, version, mode, kdf_id, iterations, salt_length, iv_length = ENVELOPE_HEADER.unpack(header)
+        algorithm = _check_envelope_fields(version, kdf_id)
+        salt_and_iv = _read_exactly(source, salt_length + iv_length)
+        if len(salt_and_iv) < salt_length + iv_length:
+            raise ValueError("Envelope is truncated.")
+        return mode, algorithm, iterations, salt_and_iv[:salt_length], salt_and_iv[salt_length:]
+
+    header = prefix + _read_exactly(source, LEGACY_HEADER_SIZE - len(prefix))
+    if len(header) < LEGACY_HEADER_SIZE:
+        raise ValueError("Encrypted stream is too short to contain a salt and IV.")
+    return MODE_CFB, 'sha256', 100000, header[:16], header[16:]
+
+
+def _derive_key_worker(password, salt, iterations, algorithm):
+    # Generate key from password and salt using PBKDF2; module level so derivations can run in worker processes
+    kdf = PBKDF2HMAC(
+        algorithm=KDF_ALGORITHMS[algorithm](),
+        length=32,
+        salt=salt,
+        iterations=iterations,
+        backend=default_backend()
+    )
+    return kdf.derive(password)
+
+
+def _envelope_header(mode, algorithm, iterations, salt, iv):
+    # Serialize an envelope header followed by the salt and IV
+    return ENVELOPE_HEADER.pack(ENVELOPE_MAGIC, ENVELOPE_VERSION, mode, KDF_ALGORITHM_IDS[algorithm],
+                                iterations, len(salt), len(iv)) + bytes(salt) + bytes(iv)
+
+
+def _iter_segments(source, size):
+    # Yield (index, is_last, data) for consecutive segments, reading one segment ahead to flag the last one
+    index = 0
+    current = _read_exactly(source, size)
+    while True:
+        following = _read_exactly(source, size) if len(current) == size else b''
+        is_last = not following
+        yield index, is_last, current
+        if is_last:
+            return
+        index += 1
+        current = following
+
+
+def _slice_segments(view, size):
+    # Yield (index, is_last, data) like _iter_segments, as memoryview slices of data already in memory
+    count = max(1, -(-len(view) // size))
+    for index in range(count):
+        yield index, index == count - 1, view[index * size:(index + 1) * size]
+
+
+def _segments_of(source, size):
+    # Segments of a readable file, or of bytes-like data without copying it
+    if hasattr(source, 'read'):
+        return _iter_segments(source, size)
+    return _slice_segments(memoryview(source).cast('B'), size)
+
+
+def _segment_nonce(nonce_prefix, index, is_last):
+    # Build the 12-byte GCM nonce for a segment from the random prefix, its index and the final flag
+    if index >= 2 ** 32:
+        raise ValueError("Too many segments; use a larger segment size.")
+    return nonce_prefix + SEGMENT_NONCE_SUFFIX.pack(index, 1 if is_last else 0)
+
+
+def _encrypt_segment(key, nonce_prefix, index, is_last, data, header):
+    # Encrypt one segment; module level so it can run in a worker process
+    return AESGCM(key).encrypt(_segment_nonce(nonce_prefix, index, is_last), data, header)
+
+
+def _decrypt_segment(key, nonce_prefix, index, is_last, data, header):
+    # Verify and decrypt one segment; module level so it can run in a worker process
+    try:
+        return AESGCM(key).decrypt(_segment_nonce(nonce_prefix, index, is_last), data, header)
+    except InvalidTag:
+        raise ValueError(f"Segment {index} failed authentication (wrong password, or data was modified or truncated).")
+
+
+def _read_exactly(source, size):
+    # Read up to size bytes, retrying on short reads from pipes and sockets
+    data = b''
+    while len(data) < size:
+        chunk = source.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _transform_file(stream_function, input_path, output_path, chunk_size):
+    # Run a streaming encrypt/decrypt function between two files, removing partial output on failure
+    if os.path.abspath(input_path) == os.path.abspath(output_path):
+        raise ValueError("Input and output file paths cannot be the same.")
+    if os.path.exists(output_path):
+        raise ValueError(f"Output file '{output_path}' already exists.")
+
+    try:
+        with open(input_path, 'rb') as source, open(output_path, 'wb') as destination:
+            return stream_function(source, destination, chunk_size)
+    except OSError as e:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise RuntimeError(f"File operation failed: {str(e)}")
+    except RuntimeError:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+
 def validate_password(password):
     # Regular expression to enforce password constraints:
     # At least 8 characters long, contains at least one lowercase letter,
@@ -99,9 +866,32 @@ def get_user_choice():
             sys.exit(1)
 
 
+# Function to encrypt or decrypt a file given on the command line
+def run_file_mode(argv):
+    if len(argv) not in [3, 4] or argv[0] not in ['encrypt-file', 'decrypt-file']:
+        raise ValueError("Usage: python aes_cryptography_utility.py <encrypt-file|decrypt-file> <input_path> "
+                         "<output_path> [cfb|gcm]")
+
+    purpose, input_path, output_path = argv[:3]
+    cipher_mode = argv[3].lower() if len(argv) == 4 else 'cfb'  # Decryption detects the mode from the file
+    password = input("Enter password for encryption/decryption: ")
+    validate_password(password)
+    with AESCipher(password, cipher_mode=cipher_mode) as aes_cipher:
+        if purpose == 'encrypt-file':
+            aes_cipher.encrypt_file(input_path, output_path)
+            print(f"File '{input_path}' encrypted and saved as '{output_path}'.")
+        else:
+            aes_cipher.decrypt_file(input_path, output_path)
+            print(f"File '{input_path}' decrypted and saved as '{output_path}'.")
+
+
 # Example usage:
 if __name__ == "__main__":
     try:
+        if len(sys.argv) > 1:
+            run_file_mode(sys.argv[1:])
+            sys.exit(0)
+
         password = input("Enter password for encryption/decryption: ")
         validate_password(password)
         aes_cipher = AESCipher(password)
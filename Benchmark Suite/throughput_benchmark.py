@@ -0,0 +1,328 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import string
+import sys
+import tempfile
+import time
+
+# Location of the sibling utilities benchmarked by this script
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECKSUM_WIZARD_PATH = os.path.join(REPOSITORY_ROOT, 'Checksum Wizard', 'ChecksumWizard.py')
+HASHING_WIZARD_PATH = os.path.join(REPOSITORY_ROOT, 'Hashing Wizard', 'HashingWizard.py')
+
+FILE_PATHS = ['buffered', 'mmap', 'streaming', 'parallel']  # ChecksumWizard code paths
+PASSWORD_PATHS = ['plain', 'salted']  # HashingWizard code paths
+RESULTS_VERSION = 1  # Bumped when the layout of the JSON results changes
+DEFAULT_THRESHOLD = 10.0  # Percent drop against the baseline reported as a regression
+MEBIBYTE = 1024 * 1024
+
+
+class BenchmarkError(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def load_module(name, path):
+    """
+    Import one of the sibling scripts by path, since their folder names are not valid package names.
+
+    :param name: Name to register the module under.
+    :param path: Path to the script.
+    :return: The imported module.
+    """
+    if not os.path.isfile(path):
+        raise BenchmarkError(f"Cannot find '{path}'.")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def generate_file(work_dir, size, seed):
+    """
+    Create (or reuse) a file of pseudo-random bytes, so repeated runs hash identical content.
+
+    :param work_dir: Directory the file is written to.
+    :param size: File size in bytes.
+    :param seed: Seed of the byte generator.
+    :return: Path to the file.
+    """
+    file_path = os.path.join(work_dir, f"synthetic-{size}-{seed}.bin")
+    if os.path.isfile(file_path) and os.path.getsize(file_path) == size:
+        return file_path
+    generator = random.Random(seed)
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'wb') as synthetic_file:
+        remaining = size
+        while remaining:
+            block = min(remaining, 4 * MEBIBYTE)
+            synthetic_file.write(generator.randbytes(block))
+            remaining -= block
+    os.replace(temp_path, file_path)
+    return file_path
+
+
+def generate_passwords(count, seed, min_length=8, max_length=32):
+    """
+    Build a reproducible corpus of printable passwords of varying length.
+
+    :param count: Number of passwords.
+    :param seed: Seed of the generator.
+    :return: List of password strings.
+    """
+    generator = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + string.punctuation
+    return [''.join(generator.choices(alphabet, k=generator.randint(min_length, max_length)))
+            for _ in range(count)]
+
+
+def best_time(function, repeat):
+    """
+    Run a function several times and keep the fastest run, which is the least disturbed by other load.
+
+    :return: Tuple of (seconds, return value of the fastest run).
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, value)
+    return best
+
+
+def benchmark_file_paths(checksum_wizard, file_path, algorithms, paths, buffer_size, workers, repeat):
+    """
+    Measure ChecksumWizard throughput in MB/s.
+
+    'buffered' and 'mmap' hash each algorithm on its own; 'streaming' feeds every algorithm from a single
+    buffered pass, and 'parallel' splits the algorithms across worker threads (both with buffered reads
+    and with the memory mapping).
+
+    :return: Dictionary mapping result names to result entries.
+    """
+    file_size = os.path.getsize(file_path)
+
+    def run(hash_methods, reader):
+        hashers = checksum_wizard.create_hashers(hash_methods)
+        return reader(hashers)
+
+    cases = []
+    for algorithm in algorithms:
+        if 'buffered' in paths:
+            cases.append((f"checksum/buffered/{algorithm}", [algorithm],
+                          lambda hashers: checksum_wizard.stream_file_into_hashers(file_path, hashers, buffer_size)))
+        if 'mmap' in paths:
+            cases.append((f"checksum/mmap/{algorithm}", [algorithm],
+                          lambda hashers: checksum_wizard.mmap_file_into_hashers(file_path, hashers, buffer_size)))
+    if 'streaming' in paths:
+        cases.append(("checksum/streaming/all", algorithms,
+                      lambda hashers: checksum_wizard.stream_file_into_hashers(file_path, hashers, buffer_size)))
+    if 'parallel' in paths:
+        cases.append(("checksum/parallel/all", algorithms,
+                      lambda hashers: checksum_wizard.stream_file_into_hashers_parallel(
+                          file_path, hashers, buffer_size, workers)))
+        cases.append(("checksum/parallel-mmap/all", algorithms,
+                      lambda hashers: checksum_wizard.mmap_file_into_hashers(
+                          file_path, hashers, buffer_size, workers)))
+
+    results = {}
+    for name, hash_methods, reader in cases:
+        seconds, total = best_time(lambda: run(hash_methods, reader), repeat)
+        if total != file_size:
+            raise BenchmarkError(f"{name} hashed {total} of {file_size} bytes.")
+        results[name] = result_entry(file_size / MEBIBYTE / seconds, 'MB/s', seconds)
+        print(f"{name:<36} {results[name]['value']:>12.1f} MB/s", file=sys.stderr)
+    return results
+
+
+def benchmark_password_paths(hashing_wizard, passwords, algorithms, paths, repeat):
+    """
+    Measure HashingWizard throughput in hashes per second, one algorithm at a time.
+
+    :return: Dictionary mapping result names to result entries.
+    """
+    wizard = hashing_wizard.HashingWizard('')
+    compute = {'plain': wizard.compute_hashes_without_salt, 'salted': wizard.compute_hashes_with_salt}
+
+    def run(method):
+        for password in passwords:
+            wizard.usr_password = password
+            method()
+
+    results = {}
+    for path in paths:
+        for algorithm in algorithms:
+            wizard.hash_list = [algorithm]
+            seconds, _ = best_time(lambda: run(compute[path]), repeat)
+            name = f"hashing/{path}/{algorithm}"
+            results[name] = result_entry(len(passwords) / seconds, 'ops/s', seconds)
+            print(f"{name:<36} {results[name]['value']:>12.0f} ops/s", file=sys.stderr)
+    return results
+
+
+def result_entry(value, unit, seconds):
+    return {'value': round(value, 3), 'unit': unit, 'seconds': round(seconds, 6)}
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results against a stored baseline; every metric is higher-is-better.
+
+    :param results: Results document of the current run.
+    :param baseline: Results document of the baseline run.
+    :param threshold: Percentage drop beyond which a metric counts as a regression.
+    :return: List of (name, baseline value, current value, change in percent) for the regressions.
+    """
+    regressions, missing = [], []
+    current = results['results']
+    for name, reference in sorted(baseline.get('results', {}).items()):
+        if name not in current:
+            missing.append(name)
+            continue
+        if reference['unit'] != current[name]['unit'] or reference['value'] <= 0:
+            continue
+        change = (current[name]['value'] - reference['value']) / reference['value'] * 100
+        flag = 'REGRESSION' if change < -threshold else ''
+        print(f"{name:<36} {reference['value']:>12.1f} -> {current[name]['value']:>12.1f} "
+              f"{reference['unit']:<6} {change:+7.1f}% {flag}", file=sys.stderr)
+        if flag:
+            regressions.append((name, reference['value'], current[name]['value'], change))
+    if missing:
+        print(f"{len(missing)} baseline result(s) not measured in this run.", file=sys.stderr)
+
+    baseline_meta, current_meta = baseline.get('meta', {}), results['meta']
+    for key in ('file_size', 'passwords', 'buffer_size', 'workers', 'cpu_count', 'python'):
+        if baseline_meta.get(key) != current_meta.get(key):
+            print(f"Warning: {key} differs from the baseline "
+                  f"({baseline_meta.get(key)} vs {current_meta.get(key)}).", file=sys.stderr)
+    return regressions
+
+
+def load_results(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as results_file:
+            results = json.load(results_file)
+    except (OSError, ValueError) as e:
+        raise BenchmarkError(f"Cannot read results from '{path}': {e}")
+    if results.get('version') != RESULTS_VERSION:
+        raise BenchmarkError(f"'{path}' is not a version {RESULTS_VERSION} results file.")
+    return results
+
+
+def parse_list(choices):
+    # Build an argparse type accepting a comma-separated subset of the choices
+    def parse(value):
+        items = [item.strip().lower() for item in value.split(',') if item.strip()]
+        unknown = [item for item in items if item not in choices]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown value(s): {', '.join(unknown)}")
+        return items
+    return parse
+
+
+def parse_arguments(argv, hash_list):
+    """
+    Parse the command-line arguments.
+
+    :param argv: Arguments without the program name.
+    :param hash_list: Algorithms that may be benchmarked.
+    :return: argparse.Namespace with the benchmark options.
+    """
+    parser = argparse.ArgumentParser(usage="python throughput_benchmark.py [options]")
+    parser.add_argument('--file-size', type=int, default=64, help="synthetic file size in MiB (default: 64)")
+    parser.add_argument('--passwords', type=int, default=20000,
+                        help="number of synthetic passwords (default: 20000)")
+    parser.add_argument('--algo', type=parse_list(hash_list), default=list(hash_list),
+                        help="comma-separated algorithms (default: all)")
+    parser.add_argument('--paths', type=parse_list(FILE_PATHS + PASSWORD_PATHS),
+                        default=FILE_PATHS + PASSWORD_PATHS,
+                        help=f"comma-separated code paths out of {', '.join(FILE_PATHS + PASSWORD_PATHS)} "
+                             "(default: all)")
+    parser.add_argument('--buffer-size', type=int, default=None, help="read buffer size in bytes")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="threads for the parallel paths (default: CPU count)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement; the fastest counts")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic data (default: 0)")
+    parser.add_argument('--work-dir', default=None,
+                        help="directory holding the synthetic file (default: the system temporary directory)")
+    parser.add_argument('--output', help="file the JSON results are written to (default: standard output)")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"percentage drop flagged as a regression (default: {DEFAULT_THRESHOLD})")
+    return parser.parse_args(argv)
+
+
+def main():
+    try:
+        checksum_wizard = load_module('ChecksumWizard', CHECKSUM_WIZARD_PATH)
+        hashing_wizard = load_module('HashingWizard', HASHING_WIZARD_PATH)
+        hash_list = hashing_wizard.HashingWizard('').hash_list
+        args = parse_arguments(sys.argv[1:], hash_list)
+        if min(args.file_size, args.passwords, args.workers, args.repeat) < 1:
+            raise BenchmarkError("Sizes, workers and repeat counts must be at least 1.")
+        buffer_size = args.buffer_size or checksum_wizard.DEFAULT_BUFFER_SIZE
+        baseline = load_results(args.baseline) if args.baseline else None
+
+        results = {
+            'version': RESULTS_VERSION,
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'file_size': args.file_size * MEBIBYTE,
+                'passwords': args.passwords,
+                'buffer_size': buffer_size,
+                'workers': args.workers,
+                'repeat': args.repeat,
+                'seed': args.seed,
+            },
+            'results': {},
+        }
+
+        file_paths = [path for path in args.paths if path in FILE_PATHS]
+        if file_paths:
+            work_dir = args.work_dir or tempfile.gettempdir()
+            file_path = generate_file(work_dir, args.file_size * MEBIBYTE, args.seed)
+            results['results'].update(benchmark_file_paths(
+                checksum_wizard, file_path, args.algo, file_paths, buffer_size, args.workers, args.repeat))
+        password_paths = [path for path in args.paths if path in PASSWORD_PATHS]
+        if password_paths:
+            passwords = generate_passwords(args.passwords, args.seed)
+            results['results'].update(benchmark_password_paths(
+                hashing_wizard, passwords, args.algo, password_paths, args.repeat))
+
+        document = json.dumps(results, indent=4)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output_file:
+                output_file.write(document + '\n')
+        else:
+            print(document)
+
+        if baseline is not None:
+            regressions = compare_results(results, baseline, args.threshold)
+            if regressions:
+                print(f"{len(regressions)} regression(s) beyond {args.threshold}%.", file=sys.stderr)
+                sys.exit(1)
+            print("No regressions.", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Process interrupted by the user.")
+        sys.exit(1)  # Exit the script with an error status code
+    except BenchmarkError as be:
+        print(f'Error running benchmark: {be.message}')
+        sys.exit(1)  # Exit the script with an error status code
+    except Exception as e:
+        print(f'Unexpected error occurred: {e}')
+        sys.exit(1)  # Exit the script with an error status code
+
+
+if __name__ == "__main__":
+    main()
+    sys.exit(0)
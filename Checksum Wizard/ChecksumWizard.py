@@ -1,5 +1,54 @@
+import argparse
+import base64
+import binascii
 import hashlib
+import hmac
+import itertools
+import mmap
+import os
+import queue
+import re
+import sqlite3
+import stat
+import struct
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024  # Size of the reusable read buffer used when streaming files
+IO_MODES = ['auto', 'mmap', 'buffered']  # How file content reaches the hashers (see read_file_into_hashers)
+
+# Hash methods computed when no algorithms are selected
+HASH_METHODS = [
+    'md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512',
+    'sha3_224', 'sha3_256', 'sha3_384', 'sha3_512'
+]
+
+# Directory mode: files are scheduled on the process pool a block at a time, largest first, with small
+# files batched into shared tasks so that per-task overhead does not dominate
+MANIFEST_BLOCK_SIZE = 4096
+SMALL_FILE_LIMIT = 4 * 1024 * 1024
+SMALL_FILE_BATCH = 64
+
+# Manifest line formats: GNU '<digest>  <path>' (as written by sha256sum) and BSD 'SHA256 (<path>) = <digest>'
+GNU_MANIFEST_LINE = re.compile(r'^([0-9a-fA-F]+) [ *](.*)$')
+BSD_MANIFEST_LINE = re.compile(r'^([A-Za-z0-9-]+) \((.*)\) = ([0-9a-fA-F]+)$')
+
+# Tree-hash mode: the file is split into fixed-size leaves, each hashed as H(0x00 || leaf); pairs of nodes
+# are combined as H(0x01 || left || right), and an odd node is carried up unchanged. The sidecar file holds
+# a header, the root digest and every leaf digest, so single ranges can be re-verified later.
+DEFAULT_LEAF_SIZE = 4 * 1024 * 1024
+MERKLE_MAGIC = b'CWMT'
+MERKLE_VERSION = 1
+MERKLE_HEADER = struct.Struct('>4sB16sQQQ')  # Magic, version, hash method, leaf size, file size, leaf count
+
+# Approximate relative cost per byte of each hash method, used to balance algorithms across worker threads
+ALGORITHM_COST = {
+    'md5': 1.0, 'sha1': 0.8, 'sha224': 1.6, 'sha256': 1.6, 'sha384': 1.1, 'sha512': 1.1,
+    'sha3_224': 1.4, 'sha3_256': 1.5, 'sha3_384': 1.9, 'sha3_512': 2.7
+}
 
 # Custom Exception class for handling errors specific to ChecksumWizard
 class ChecksumWizardError(Exception):
@@ -9,30 +58,43 @@ class ChecksumWizardError(Exception):
 
 # Checksum Wizard Class to compute hash values for a given file
 class ChecksumWizard:
-    def __init__(self, file_path, checksum=None):
+    def __init__(self, file_path, checksum=None, algorithms=None, buffer_size=DEFAULT_BUFFER_SIZE, workers=1,
+                 cache=None, paranoid=False, io_mode='auto'):
         """
         Initialize ChecksumWizard with file path and optional checksum for validation.
 
         :param file_path: Path to the file whose checksum is to be computed or validated.
         :param checksum: Optional checksum value for verification (used only in 'validate' mode).
+        :param algorithms: Optional list of hash methods to compute (defaults to every method in hash_list).
+        :param buffer_size: Size in bytes of the buffer the file is streamed through.
+        :param workers: Number of threads hashing in parallel; each thread owns a group of hash methods.
+        :param cache: Optional ChecksumCache answering unchanged files without reading them.
+        :param paranoid: If True, always rehash (the cache is still refreshed with the new digests).
+        :param io_mode: 'auto', 'mmap' or 'buffered'; see read_file_into_hashers().
         """
-        self.hash_list = [
-            'md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512',
-            'sha3_224', 'sha3_256', 'sha3_384', 'sha3_512'
-        ]
+        self.hash_list = list(algorithms) if algorithms else list(HASH_METHODS)
         self.checksum_values = []  # List to store computed checksum values
         self.file_path = file_path
         self.checksum = checksum  # Checksum value for comparison (for 'validate' mode)
-        self.bytes_content = None  # Content of the file to be read
+        self.bytes_content = None  # Optional in-memory content; when unset the file is streamed from disk
+        self.buffer_size = buffer_size
+        self.file_size = None  # Size of the file, recorded by source_file_analyzer()
+        self.workers = workers
+        self.cache = cache
+        self.paranoid = paranoid
+        self.io_mode = io_mode
 
     def source_file_analyzer(self):
         """
-        Read the content of the file into memory. This method must be called before computing checksums.
+        Check that the file can be opened for reading. This method must be called before computing checksums.
+
+        The content itself is streamed later by compute_checksum_for_binary_form_data(), so it is never
+        held in memory as a whole.
         """
         try:
             with open(self.file_path, 'rb') as binary_form_data:
-                self.bytes_content = binary_form_data.read()
-                print(f"File '{self.file_path}' successfully read.")
+                self.file_size = os.fstat(binary_form_data.fileno()).st_size
+                print(f"File '{self.file_path}' successfully opened ({self.file_size} bytes).")
         except FileNotFoundError:
             raise ChecksumWizardError(f"File '{self.file_path}' not found.")
         except PermissionError:
@@ -43,22 +105,43 @@ class ChecksumWizard:
     def compute_checksum_for_binary_form_data(self):
         """
         Compute checksums for the file content using the predefined hash methods and store them in `self.checksum_values`.
+
+        The file is read once, and every hash method is fed from the same chunk of a reusable buffer.
         """
-        if self.bytes_content is None:
+        if self.bytes_content is None and self.file_size is None:
             raise ChecksumWizardError("No file content available. Please run source_file_analyzer() first.")
         
         print(f"Computing checksums for file content using methods: {', '.join(self.hash_list)}")
         self.checksum_values.clear()  # Clear checksum_values list
+
+        # Answer from the cache the methods whose digest is known for this exact file identity
+        cached = {}
+        identity = None
+        if self.cache is not None and self.bytes_content is None:
+            identity = stat_identity(self.file_path)
+            if not self.paranoid:
+                for hash_method in self.hash_list:
+                    digest = self.cache.lookup(identity, hash_method)
+                    if digest:
+                        cached[hash_method] = digest
+
+        hashers = create_hashers([hash_method for hash_method in self.hash_list if hash_method not in cached])
+        if self.bytes_content is not None:
+            for hash_obj in hashers.values():
+                hash_obj.update(self.bytes_content)
+        elif hashers:
+            read_file_into_hashers(self.file_path, hashers, self.buffer_size, self.io_mode, self.workers)
+
+        # Only cache digests if the file did not change while it was being read
+        if identity is not None and hashers and stat_identity(self.file_path) == identity:
+            for hash_method, hash_obj in hashers.items():
+                self.cache.store(identity, hash_method, hash_obj.hexdigest())
+            self.cache.commit()
+
         for hash_method in self.hash_list:
-            hash_function = getattr(hashlib, hash_method, None)
-            if hash_function is None:
-                raise ChecksumWizardError(f"Hash method '{hash_method}' is not available.")
-            
-            hash_obj = hash_function()
-            hash_obj.update(self.bytes_content)
-            checksum = hash_obj.hexdigest()
+            checksum = cached[hash_method] if hash_method in cached else hashers[hash_method].hexdigest()
             self.checksum_values.append((hash_method, checksum))
-            print(f"{hash_method}: {checksum}")
+            print(f"{hash_method}: {checksum}{' (cached)' if hash_method in cached else ''}")
 
     def verify_checksum(self):
         """
@@ -71,15 +154,868 @@ class ChecksumWizard:
             raise ChecksumWizardError("No checksum provided for validation.")
         
         print(f"Verifying checksum: {self.checksum}")
+        expected = decode_checksum(self.checksum)
         matched = False
         for method, computed_checksum in self.checksum_values:
-            if self.checksum == computed_checksum:
+            # Compare raw digests in constant time; hex case and base64 encoding do not matter
+            if hmac.compare_digest(expected, bytes.fromhex(computed_checksum)):
                 print(f"Checksum matched using {method}: {computed_checksum}")
                 matched = True
                 break
 
         if not matched:
             print(f"No matching checksum found. Computed checksums were: {self.checksum_values}")
+        return matched
+
+def decode_checksum(checksum):
+    """
+    Decode a hex or base64 checksum into raw digest bytes.
+
+    Hex is tried first; base64 (standard or URL-safe) is used when the text is not hex, or when its hex
+    decoding does not have the length of any known digest.
+
+    :param checksum: Checksum text.
+    :return: Raw digest bytes.
+    """
+    checksum = checksum.strip()
+    digest = None
+    try:
+        digest = bytes.fromhex(checksum)
+        if len(digest) in digest_sizes():
+            return digest
+    except ValueError:
+        pass
+    try:
+        return base64.b64decode(checksum.replace('-', '+').replace('_', '/'), validate=True)
+    except (binascii.Error, ValueError):
+        if digest is not None:
+            return digest
+        raise ChecksumWizardError(f"Checksum '{checksum}' is neither hex nor base64 encoded.")
+
+def digest_sizes(hash_methods=HASH_METHODS):
+    """
+    Map digest sizes in bytes to the hash methods that produce them.
+
+    :param hash_methods: Names of hashlib algorithms to consider.
+    :return: Dictionary of digest size -> list of hash methods.
+    """
+    sizes = {}
+    for hash_method in hash_methods:
+        sizes.setdefault(hashlib.new(hash_method).digest_size, []).append(hash_method)
+    return sizes
+
+def check_algorithm(algorithm):
+    """
+    Make sure a hash method can produce checksums: it must be a hashlib constructor with a fixed-length digest.
+
+    :param algorithm: Name of the hash method.
+    :return: The hash method name.
+    :raises ChecksumWizardError: If the method is unknown or an extendable-output function such as shake_128.
+    """
+    if algorithm in HASH_METHODS:
+        return algorithm
+    hash_function = getattr(hashlib, algorithm, None)
+    if algorithm not in hashlib.algorithms_available or not callable(hash_function):
+        raise ChecksumWizardError(f"Hash method '{algorithm}' is not available.")
+    if hash_function().digest_size == 0:  # XOFs such as shake_128 need an output length for every digest
+        raise ChecksumWizardError(f"Hash method '{algorithm}' has no fixed digest length; "
+                                  f"choose one of {', '.join(HASH_METHODS)}.")
+    return algorithm
+
+def candidate_algorithms(checksum, algorithm=None):
+    """
+    Work out which hash methods could have produced a checksum, so only those need to be computed.
+
+    :param checksum: Hex or base64 checksum text.
+    :param algorithm: Optional explicit hash method, which skips detection.
+    :return: List of candidate hash methods.
+    """
+    if algorithm:
+        return [check_algorithm(algorithm)]
+
+    size = len(decode_checksum(checksum))
+    candidates = digest_sizes().get(size)
+    if not candidates:
+        raise ChecksumWizardError(f"Cannot infer the hash method of a {size}-byte checksum; use --algo.")
+    return candidates
+
+# Persistent cache of digests keyed by file identity, so unchanged files need not be re-read
+class ChecksumCache:
+    def __init__(self, path):
+        """
+        Open (or create) the SQLite cache database.
+
+        :param path: Path of the cache database file.
+        """
+        try:
+            self.connection = sqlite3.connect(path)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS checksums ("
+                "device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, algorithm TEXT, "
+                "digest TEXT NOT NULL, last_used INTEGER NOT NULL, "
+                "PRIMARY KEY (device, inode, size, mtime_ns, algorithm))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS checksums_last_used ON checksums (last_used)")
+        except sqlite3.Error as e:
+            raise ChecksumWizardError(f"Cannot open checksum cache '{path}': {e}")
+        self.pending_writes = 0
+
+    def lookup(self, identity, hash_method):
+        """
+        Return the cached digest for a file identity and hash method, or None.
+
+        :param identity: (device, inode, size, mtime_ns) tuple from stat_identity().
+        :param hash_method: Name of the hash method.
+        """
+        row = self.connection.execute(
+            "SELECT digest FROM checksums WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ? "
+            "AND algorithm = ?", (*identity, hash_method)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            "UPDATE checksums SET last_used = ? WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ? "
+            "AND algorithm = ?", (int(time.time()), *identity, hash_method))
+        self._count_write()
+        return row[0]
+
+    def store(self, identity, hash_method, digest):
+        """
+        Record the digest computed for a file identity and hash method.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO checksums (device, inode, size, mtime_ns, algorithm, digest, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", (*identity, hash_method, digest, int(time.time())))
+        self._count_write()
+
+    def evict(self, max_age_days=None, max_entries=None):
+        """
+        Remove entries not used within max_age_days, then the least recently used beyond max_entries.
+
+        :return: Number of entries removed.
+        """
+        removed = 0
+        if max_age_days is not None:
+            cutoff = int(time.time() - max_age_days * 86400)
+            removed += self.connection.execute("DELETE FROM checksums WHERE last_used < ?", (cutoff,)).rowcount
+        if max_entries is not None:
+            removed += self.connection.execute(
+                "DELETE FROM checksums WHERE rowid IN (SELECT rowid FROM checksums ORDER BY last_used DESC "
+                "LIMIT -1 OFFSET ?)", (max_entries,)).rowcount
+        self.commit()
+        return removed
+
+    def compact(self):
+        """
+        Reclaim the space left by removed entries.
+        """
+        self.commit()
+        self.connection.execute("VACUUM")
+
+    def commit(self):
+        self.connection.commit()
+        self.pending_writes = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def _count_write(self):
+        # Commit in batches rather than once per file
+        self.pending_writes += 1
+        if self.pending_writes >= 1000:
+            self.commit()
+
+def stat_identity(file_path):
+    """
+    Return the (device, inode, size, mtime_ns) identity of a file.
+    """
+    try:
+        stat_result = os.stat(file_path)
+    except OSError as e:
+        raise read_error(file_path, e)
+    return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+def create_hashers(hash_methods):
+    """
+    Create a fresh hash object for each hash method.
+
+    :param hash_methods: Names of hashlib algorithms.
+    :return: Dictionary mapping each method name to its hash object, in the given order.
+    """
+    hashers = {}
+    for hash_method in hash_methods:
+        hash_function = getattr(hashlib, hash_method, None)
+        if hash_function is None:
+            raise ChecksumWizardError(f"Hash method '{hash_method}' is not available.")
+        hashers[hash_method] = hash_function()
+    return hashers
+
+def read_file_into_hashers(file_path, hashers, buffer_size=DEFAULT_BUFFER_SIZE, io_mode='auto', workers=1):
+    """
+    Feed a file to every hasher using the memory-mapped path where possible, else buffered reads.
+
+    'mmap' maps every regular, non-empty file; 'auto' only maps files larger than one buffer, where skipping
+    the userspace copy pays off; 'buffered' never maps. Pipes, special files and filesystems that cannot
+    be mapped always fall back to buffered reads.
+
+    :return: Number of bytes hashed.
+    """
+    if io_mode != 'buffered':
+        minimum_size = buffer_size if io_mode == 'auto' else 1
+        total = mmap_file_into_hashers(file_path, hashers, buffer_size, workers, minimum_size)
+        if total is not None:
+            return total
+    if workers > 1 and len(hashers) > 1:
+        return stream_file_into_hashers_parallel(file_path, hashers, buffer_size, workers)
+    return stream_file_into_hashers(file_path, hashers, buffer_size)
+
+def mmap_file_into_hashers(file_path, hashers, buffer_size=DEFAULT_BUFFER_SIZE, workers=1, minimum_size=1):
+    """
+    Hash a file through a read-only memory mapping, passing memoryview slices of it straight to hashlib.
+
+    No file data is copied into Python buffers, and the kernel is told the access is sequential. With more
+    than one worker, each thread walks the mapping independently for its own group of hash methods.
+    Note that truncating the file while it is mapped can crash the process; use buffered reads for files
+    that may change underneath.
+
+    :return: Number of bytes hashed, or None if the file cannot (or should not) be mapped.
+    """
+    try:
+        with open(file_path, 'rb', buffering=0) as binary_form_data:
+            file_stat = os.fstat(binary_form_data.fileno())
+            if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size < minimum_size:
+                return None
+            try:
+                mapping = mmap.mmap(binary_form_data.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None  # Filesystem does not support mapping
+    except OSError as e:
+        raise read_error(file_path, e)
+
+    with mapping:
+        if hasattr(mapping, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapping.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mapping)
+        try:
+            def hash_group(group):
+                for offset in range(0, len(view), buffer_size):
+                    chunk = view[offset:offset + buffer_size]
+                    for hash_obj in group:
+                        hash_obj.update(chunk)
+                    chunk.release()
+
+            groups = group_hashers(hashers, workers)
+            if len(groups) == 1:
+                hash_group(groups[0])
+            else:
+                with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+                    list(pool.map(hash_group, groups))
+            return len(view)
+        finally:
+            view.release()  # Every export must be released before the mapping can close
+
+def stream_file_into_hashers(file_path, hashers, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Read a file once through a preallocated buffer and feed every chunk to all hashers.
+
+    :param file_path: Path of the file to read.
+    :param hashers: Dictionary of hash objects to update.
+    :param buffer_size: Size in bytes of the reusable read buffer.
+    :return: Number of bytes read.
+    """
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    total = 0
+    try:
+        with open(file_path, 'rb', buffering=0) as binary_form_data:
+            while True:
+                size = binary_form_data.readinto(buffer)
+                if not size:
+                    break
+                chunk = view[:size]
+                for hash_obj in hashers.values():
+                    hash_obj.update(chunk)
+                total += size
+    except OSError as e:
+        raise read_error(file_path, e)
+    return total
+
+def group_hashers(hashers, workers):
+    """
+    Split hash objects into at most `workers` groups of roughly equal total cost.
+
+    :param hashers: Dictionary of hash objects keyed by method name.
+    :param workers: Maximum number of groups.
+    :return: List of non-empty lists of hash objects.
+    """
+    groups = [[] for _ in range(max(1, min(workers, len(hashers))))]
+    loads = [0.0] * len(groups)
+    # Assign the most expensive methods first, each to the least loaded group
+    for hash_method in sorted(hashers, key=lambda name: ALGORITHM_COST.get(name, 1.0), reverse=True):
+        lightest = loads.index(min(loads))
+        groups[lightest].append(hashers[hash_method])
+        loads[lightest] += ALGORITHM_COST.get(hash_method, 1.0)
+    return groups
+
+def stream_file_into_hashers_parallel(file_path, hashers, buffer_size=DEFAULT_BUFFER_SIZE, workers=2, ring_size=None):
+    """
+    Read a file once and hash it with one thread per group of hash methods.
+
+    Chunks are read into a ring of preallocated buffers that every worker reads from. A buffer is reused
+    only after all workers have hashed it, so the reader waits (backpressure) when the slowest worker
+    falls behind. hashlib releases the GIL while hashing large chunks, so the groups run concurrently.
+
+    :param file_path: Path of the file to read.
+    :param hashers: Dictionary of hash objects to update.
+    :param buffer_size: Size in bytes of each ring buffer.
+    :param workers: Number of worker threads.
+    :param ring_size: Number of buffers in the ring (defaults to twice the number of workers).
+    :return: Number of bytes read.
+    """
+    groups = group_hashers(hashers, workers)
+    ring_size = ring_size or 2 * len(groups)
+    buffers = [bytearray(buffer_size) for _ in range(ring_size)]
+    views = [memoryview(buffer) for buffer in buffers]
+    free_buffers = queue.Queue()
+    for index in range(ring_size):
+        free_buffers.put(index)
+    readers_left = [0] * ring_size  # Number of workers still hashing each buffer
+    lock = threading.Lock()
+    inboxes = [queue.Queue() for _ in groups]
+    errors = []
+
+    def consume(group, inbox):
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            index, size = item
+            try:
+                if not errors:
+                    chunk = views[index][:size]
+                    for hash_obj in group:
+                        hash_obj.update(chunk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                with lock:
+                    readers_left[index] -= 1
+                    if readers_left[index] == 0:
+                        free_buffers.put(index)
+
+    threads = [threading.Thread(target=consume, args=(group, inbox), daemon=True)
+               for group, inbox in zip(groups, inboxes)]
+    for thread in threads:
+        thread.start()
+
+    total = 0
+    try:
+        with open(file_path, 'rb', buffering=0) as binary_form_data:
+            while not errors:
+                index = free_buffers.get()  # Blocks until every worker has released a buffer
+                size = binary_form_data.readinto(buffers[index])
+                if not size:
+                    break
+                readers_left[index] = len(groups)
+                for inbox in inboxes:
+                    inbox.put((index, size))
+                total += size
+    except OSError as e:
+        raise read_error(file_path, e)
+    finally:
+        for inbox in inboxes:
+            inbox.put(None)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise ChecksumWizardError(f"Error while hashing '{file_path}': {errors[0]}")
+    return total
+
+def read_error(file_path, error):
+    """
+    Translate an OSError raised while reading a file into a ChecksumWizardError.
+    """
+    if isinstance(error, FileNotFoundError):
+        return ChecksumWizardError(f"File '{file_path}' not found.")
+    if isinstance(error, PermissionError):
+        return ChecksumWizardError(f"Permission denied while accessing '{file_path}'.")
+    return ChecksumWizardError(f"Error reading '{file_path}': {error}")
+
+def read_at(binary_form_data, offset, size, lock=None):
+    """
+    Read up to size bytes at offset without moving a shared file position.
+
+    os.pread is used where available, so several threads can read the same descriptor at once; elsewhere
+    the read is serialised through lock with seek() and read().
+    """
+    if hasattr(os, 'pread'):
+        chunks = []
+        while size > 0:
+            chunk = os.pread(binary_form_data.fileno(), size, offset)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+    with lock:
+        binary_form_data.seek(offset)
+        return binary_form_data.read(size)
+
+def merkle_leaf_digests(file_path, hash_method, leaf_size, indices, workers=None):
+    """
+    Hash the requested leaves of a file in parallel threads, each reading its own range with read_at().
+
+    :return: List of leaf digests (bytes) in the order of indices.
+    """
+    lock = threading.Lock()
+    try:
+        with open(file_path, 'rb', buffering=0) as binary_form_data:
+            def hash_leaf(index):
+                hash_obj = hashlib.new(hash_method)
+                hash_obj.update(b'\x00')
+                hash_obj.update(read_at(binary_form_data, index * leaf_size, leaf_size, lock))
+                return hash_obj.digest()
+
+            with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+                return list(pool.map(hash_leaf, indices))
+    except OSError as e:
+        raise read_error(file_path, e)
+
+def merkle_root(leaves, hash_method):
+    """
+    Combine leaf digests into the root digest.
+    """
+    level = list(leaves)
+    while len(level) > 1:
+        parents = []
+        for index in range(0, len(level) - 1, 2):
+            parents.append(hashlib.new(hash_method, b'\x01' + level[index] + level[index + 1]).digest())
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+    return level[0]
+
+def compute_merkle_tree(file_path, hash_method='sha256', leaf_size=DEFAULT_LEAF_SIZE, workers=None):
+    """
+    Compute the tree hash of a file, hashing its leaves in parallel.
+
+    :return: Tuple of (root digest, list of leaf digests, file size).
+    """
+    file_size = stat_identity(file_path)[2]
+    leaf_count = max(1, -(-file_size // leaf_size))
+    leaves = merkle_leaf_digests(file_path, hash_method, leaf_size, range(leaf_count), workers)
+    return merkle_root(leaves, hash_method), leaves, file_size
+
+def write_merkle_sidecar(sidecar_path, hash_method, leaf_size, file_size, root, leaves):
+    """
+    Write the tree header, root digest and leaf digests to a sidecar file.
+    """
+    try:
+        with open(sidecar_path, 'wb') as sidecar:
+            sidecar.write(MERKLE_HEADER.pack(MERKLE_MAGIC, MERKLE_VERSION, hash_method.encode('ascii'), leaf_size,
+                                             file_size, len(leaves)))
+            sidecar.write(root)
+            for leaf in leaves:
+                sidecar.write(leaf)
+    except OSError as e:
+        raise ChecksumWizardError(f"Cannot write sidecar '{sidecar_path}': {e}")
+
+def read_merkle_sidecar(sidecar_path):
+    """
+    Read a sidecar file and check that its leaf digests still combine into its root digest.
+
+    :return: Dictionary with hash_method, leaf_size, file_size, root and leaves.
+    """
+    try:
+        with open(sidecar_path, 'rb') as sidecar:
+            data = sidecar.read()
+    except OSError as e:
+        raise read_error(sidecar_path, e)
+
+    if len(data) < MERKLE_HEADER.size or data[:len(MERKLE_MAGIC)] != MERKLE_MAGIC:
+        raise ChecksumWizardError(f"'{sidecar_path}' is not a tree-hash sidecar file.")
+    _, version, name, leaf_size, file_size, leaf_count = MERKLE_HEADER.unpack_from(data)
+    if version != MERKLE_VERSION:
+        raise ChecksumWizardError(f"Unsupported sidecar version {version}.")
+    hash_method = name.rstrip(b'\x00').decode('ascii')
+    digest_size = hashlib.new(hash_method).digest_size
+    if len(data) != MERKLE_HEADER.size + digest_size * (leaf_count + 1):
+        raise ChecksumWizardError(f"Sidecar '{sidecar_path}' is truncated.")
+
+    offset = MERKLE_HEADER.size
+    root = data[offset:offset + digest_size]
+    leaves = [data[offset + digest_size * (index + 1):offset + digest_size * (index + 2)] for index in range(leaf_count)]
+    if not hmac.compare_digest(merkle_root(leaves, hash_method), root):
+        raise ChecksumWizardError(f"Sidecar '{sidecar_path}' is corrupted: its leaves do not match its root.")
+    return {'hash_method': hash_method, 'leaf_size': leaf_size, 'file_size': file_size, 'root': root,
+            'leaves': leaves}
+
+def verify_merkle_ranges(file_path, sidecar, ranges=None, workers=None):
+    """
+    Rehash only the leaves overlapping the given byte ranges (or all leaves) and compare them to the sidecar.
+
+    :param sidecar: Dictionary returned by read_merkle_sidecar().
+    :param ranges: Optional list of (offset, length) byte ranges.
+    :return: List of indices of leaves whose content no longer matches.
+    """
+    leaf_size = sidecar['leaf_size']
+    leaf_count = len(sidecar['leaves'])
+    if ranges:
+        indices = sorted({index for offset, length in ranges
+                          for index in range(offset // leaf_size, min(leaf_count, -(-(offset + length) // leaf_size)))})
+    else:
+        indices = range(leaf_count)
+    digests = merkle_leaf_digests(file_path, sidecar['hash_method'], leaf_size, indices, workers)
+    return [index for index, digest in zip(indices, digests)
+            if not hmac.compare_digest(digest, sidecar['leaves'][index])]
+
+def iter_tree_files(root, exclude=None):
+    """
+    Yield every regular file below a directory in a deterministic (sorted) order.
+
+    :param root: Directory to walk.
+    :param exclude: Optional absolute path to leave out (for example a manifest being written inside the tree).
+    :return: Generator of paths relative to root, using '/' as separator.
+    """
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            full_path = os.path.join(directory, filename)
+            if os.path.isfile(full_path) and os.path.abspath(full_path) != exclude:
+                yield os.path.relpath(full_path, root).replace(os.sep, '/')
+
+def check_entry_path(relative_path):
+    """
+    Refuse a manifest path that is absolute or climbs out of the directory being checked.
+
+    :raises ChecksumWizardError: If the path would name a file outside the directory.
+    """
+    if os.path.isabs(relative_path) or '..' in relative_path.split('/'):
+        raise ChecksumWizardError(f"Refusing to read '{relative_path}' outside the directory.")
+
+def hash_file_batch(root, entries, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Hash a batch of files below root; module level so it can run in a worker process.
+
+    :param root: Directory the entry paths are relative to.
+    :param entries: List of tuples whose first two items are the relative path and the hash method.
+    :return: List of (hex digest, error message, identity) tuples in entry order. Either the digest or the
+             error is None; identity is the file's stat_identity() if it did not change while being read.
+    """
+    results = []
+    for relative_path, hash_method, *_ in entries:
+        try:
+            check_entry_path(relative_path)
+            file_path = os.path.join(root, relative_path)
+            identity = stat_identity(file_path)
+            hashers = create_hashers([hash_method])
+            read_file_into_hashers(file_path, hashers, buffer_size)
+            stable = stat_identity(file_path) == identity
+            results.append((hashers[hash_method].hexdigest(), None, identity if stable else None))
+        except ChecksumWizardError as e:
+            results.append((None, e.message, None))
+    return results
+
+def hash_entries(root, entries, jobs=None, buffer_size=DEFAULT_BUFFER_SIZE, cache=None, paranoid=False):
+    """
+    Hash many files on a process pool and yield the results in input order.
+
+    Entries are scheduled a block at a time. Within a block, large files are submitted first as their own
+    tasks and small files are batched; idle worker processes take the next task from the shared queue, so
+    a few large files do not hold up the rest. The next block is queued while the current one is drained.
+
+    :param root: Directory the entry paths are relative to.
+    :param entries: Iterable of tuples whose first two items are the relative path and the hash method.
+    :param jobs: Number of worker processes (defaults to the CPU count; 1 hashes in this process).
+    :param buffer_size: Size in bytes of the read buffer used for each file.
+    :param cache: Optional ChecksumCache; unchanged files are answered from it and new digests are stored.
+    :param paranoid: If True, rehash every file even when the cache knows it.
+    :return: Generator of entry + (hex digest, error message) tuples.
+    """
+    entries = iter(entries)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        for entry in entries:
+            try:
+                check_entry_path(entry[0])  # Before the file is stat'ed or looked up in the cache
+            except ChecksumWizardError as e:
+                yield tuple(entry) + (None, e.message)
+                continue
+            digest = lookup_cached_digest(cache, root, entry) if cache is not None and not paranoid else None
+            if digest is None:
+                (digest, error, identity), = hash_file_batch(root, [entry], buffer_size)
+                remember_digest(cache, entry, digest, identity)
+                yield tuple(entry) + (digest, error)
+            else:
+                yield tuple(entry) + (digest, None)
+        if cache is not None:
+            cache.commit()
+        return
+
+    pool = ProcessPoolExecutor(max_workers=jobs)
+    finished = False
+    try:
+        pending = deque()
+        while True:
+            block = list(itertools.islice(entries, MANIFEST_BLOCK_SIZE))
+            if block:
+                pending.append((block, submit_block(pool, root, block, buffer_size, cache, paranoid)))
+                if len(pending) < 2:
+                    continue
+            if not pending:
+                if cache is not None:
+                    cache.commit()
+                finished = True
+                return
+            block_entries, slots = pending.popleft()
+            for entry, (future, position) in zip(block_entries, slots):
+                if future is None:
+                    yield tuple(entry) + position  # Answered from the cache, or refused before hashing
+                    continue
+                digest, error, identity = future.result()[position]
+                remember_digest(cache, entry, digest, identity)
+                yield tuple(entry) + (digest, error)
+    finally:
+        # A consumer that stops early (such as --fail-fast) must not wait for the files still queued: only
+        # the tasks the workers already took are finished
+        pool.shutdown(cancel_futures=not finished)
+
+def lookup_cached_digest(cache, root, entry):
+    """
+    Return the cached digest for a (relative path, hash method, ...) entry, or None if unknown or unreadable.
+
+    The entry path must already have passed check_entry_path().
+    """
+    try:
+        return cache.lookup(stat_identity(os.path.join(root, entry[0])), entry[1])
+    except ChecksumWizardError:
+        return None  # Hashing reports the error
+
+def remember_digest(cache, entry, digest, identity):
+    """
+    Store a freshly computed digest in the cache when the file was stable while being read.
+    """
+    if cache is not None and digest is not None and identity is not None:
+        cache.store(identity, entry[1], digest)
+
+def submit_block(pool, root, block, buffer_size, cache=None, paranoid=False):
+    """
+    Submit one block of entries to the pool, largest files first, batching small files together.
+
+    :return: List giving, for each entry of the block, the future holding its result and its position in that
+             task, or (None, (digest, error message)) for entries answered from the cache or refused outright.
+    """
+    slots = [None] * len(block)
+    sizes = []
+    for index, entry in enumerate(block):
+        try:
+            check_entry_path(entry[0])  # Before the file is stat'ed or looked up in the cache
+        except ChecksumWizardError as e:
+            slots[index] = (None, (None, e.message))
+            sizes.append(0)
+            continue
+        try:
+            identity = stat_identity(os.path.join(root, entry[0]))
+        except ChecksumWizardError:
+            sizes.append(0)  # The worker reports the error
+            continue
+        sizes.append(identity[2])
+        if cache is not None and not paranoid:
+            digest = cache.lookup(identity, entry[1])
+            if digest:
+                slots[index] = (None, (digest, None))
+
+    tasks = []
+    small_task, small_bytes = [], 0
+    uncached = [index for index in range(len(block)) if slots[index] is None]
+    for index in sorted(uncached, key=lambda i: sizes[i], reverse=True):
+        if sizes[index] >= SMALL_FILE_LIMIT:
+            tasks.append([index])
+            continue
+        small_task.append(index)
+        small_bytes += sizes[index]
+        if len(small_task) >= SMALL_FILE_BATCH or small_bytes >= SMALL_FILE_LIMIT:
+            tasks.append(small_task)
+            small_task, small_bytes = [], 0
+    if small_task:
+        tasks.append(small_task)
+
+    for task in tasks:
+        future = pool.submit(hash_file_batch, root, [block[index] for index in task], buffer_size)
+        for position, index in enumerate(task):
+            slots[index] = (future, position)
+    return slots
+
+def format_manifest_line(relative_path, hash_method, digest, style='gnu'):
+    """
+    Format one manifest line in GNU (sha256sum) or BSD style.
+
+    Paths containing a backslash or newline are escaped and the line is prefixed with a backslash,
+    as coreutils does.
+    """
+    escaped = relative_path.replace('\\', '\\\\').replace('\n', '\\n')
+    prefix = '\\' if escaped != relative_path else ''
+    if style == 'bsd':
+        return f"{prefix}{hash_method.upper().replace('_', '-')} ({escaped}) = {digest}"
+    return f"{prefix}{digest}  {escaped}"
+
+def parse_manifest_line(line, algorithm=None):
+    """
+    Parse a GNU or BSD style manifest line.
+
+    :param line: Manifest line.
+    :param algorithm: Hash method for GNU lines; otherwise it is inferred from the digest length.
+    :return: Tuple of (relative path, hash method, digest), or None for blank and comment lines.
+    """
+    line = line.rstrip('\r\n')
+    if not line.strip() or line.startswith('#'):
+        return None
+    escaped = line.startswith('\\')
+    if escaped:
+        line = line[1:]
+
+    match = BSD_MANIFEST_LINE.match(line)
+    if match:
+        name, relative_path, digest = match.groups()
+        hash_method = check_algorithm(name.lower().replace('-', '_'))
+    else:
+        match = GNU_MANIFEST_LINE.match(line)
+        if not match:
+            raise ChecksumWizardError(f"Malformed manifest line: {line}")
+        digest, relative_path = match.groups()
+        hash_method = algorithm or candidate_algorithms(digest)[0]
+    if len(digest) % 2:
+        raise ChecksumWizardError(f"Digest '{digest}' has an odd number of hex digits.")
+
+    if escaped:
+        relative_path = re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), relative_path)
+    return relative_path, hash_method, digest.lower()
+
+def generate_manifest(root, hash_method='sha256', style='gnu', jobs=None, output=None, exclude=None, cache=None,
+                      paranoid=False):
+    """
+    Hash every file below root and stream manifest lines to output in deterministic order.
+
+    :return: Number of files that could not be read.
+    """
+    output = output or sys.stdout
+    failures = 0
+    entries = ((relative_path, hash_method) for relative_path in iter_tree_files(root, exclude))
+    for relative_path, _, digest, error in hash_entries(root, entries, jobs, cache=cache, paranoid=paranoid):
+        if error:
+            print(f"Error: {error}", file=sys.stderr)
+            failures += 1
+            continue
+        output.write(format_manifest_line(relative_path, hash_method, digest, style) + '\n')
+        output.flush()
+    return failures
+
+def validate_manifest(root, manifest_path, algorithm=None, jobs=None, fail_fast=False, output=None, cache=None,
+                      paranoid=False):
+    """
+    Check the files below root against a GNU or BSD style manifest, reporting each result as it is known.
+
+    Like sha256sum -c, improperly formatted lines do not stop the run: they are skipped, reported after
+    the results and counted as failures.
+
+    :param fail_fast: Stop at the first mismatch, unreadable file or improperly formatted line.
+    :return: Tuple of (number of files that matched, number that failed or could not be parsed).
+    """
+    output = output or sys.stdout
+    if algorithm:
+        check_algorithm(algorithm)
+    matched = failed = 0
+    malformed = []  # (line number, reason) of the lines that could not be parsed
+
+    def parse_entries(manifest):
+        for line_number, line in enumerate(manifest, start=1):
+            try:
+                entry = parse_manifest_line(line, algorithm)
+            except ChecksumWizardError as e:
+                malformed.append((line_number, e.message))
+                continue
+            if entry:
+                yield entry
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8', errors='surrogateescape') as manifest:
+            results = hash_entries(root, parse_entries(manifest), jobs, cache=cache, paranoid=paranoid)
+            try:
+                for relative_path, _, expected, digest, error in results:
+                    if error is None and hmac.compare_digest(bytes.fromhex(expected), bytes.fromhex(digest)):
+                        matched += 1
+                        output.write(f"{relative_path}: OK\n")
+                    else:
+                        failed += 1
+                        output.write(f"{relative_path}: FAILED{' (' + error + ')' if error else ''}\n")
+                        output.flush()
+                    if fail_fast and (failed or malformed):
+                        break
+            finally:
+                results.close()  # Cancels the files still queued when the loop stopped early
+    except OSError as e:
+        raise read_error(manifest_path, e)
+
+    for line_number, reason in malformed:
+        output.write(f"{manifest_path}:{line_number}: improperly formatted line ({reason})\n")
+    if malformed:
+        output.write(f"WARNING: {len(malformed)} line(s) are improperly formatted\n")
+    return matched, failed + len(malformed)
+
+def parse_arguments(argv):
+    """
+    Parse the command-line arguments.
+
+    :param argv: Arguments without the program name.
+    :return: argparse.Namespace with purpose, file_path, checksum and options.
+    """
+    parser = argparse.ArgumentParser(
+        usage="python ChecksumWizard.py <generate|validate> <file_path> [<checksum>] [options]")
+    parser.add_argument('purpose', type=lambda value: value.lower().strip())
+    parser.add_argument('file_path', type=str.strip)
+    parser.add_argument('checksum', nargs='?', type=str.strip)  # Optional checksum for 'validate' mode
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of threads hashing in parallel (default: 1, or the CPU count with --tree)")
+    parser.add_argument('--algo', type=lambda value: value.lower().strip(),
+                        help="hash method to use; in 'validate' mode it is otherwise inferred from the checksum")
+    parser.add_argument('--format', choices=['gnu', 'bsd'], default='gnu',
+                        help="manifest style written for directories (default: gnu, as sha256sum)")
+    parser.add_argument('--output', help="file the directory manifest is written to (default: standard output)")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="number of processes hashing directory files (default: CPU count)")
+    parser.add_argument('--fail-fast', action='store_true',
+                        help="stop directory validation at the first failure")
+    parser.add_argument('--cache', help="SQLite file caching digests of unchanged files between runs")
+    parser.add_argument('--paranoid', action='store_true',
+                        help="rehash every file even if the cache knows it (the cache is still refreshed)")
+    parser.add_argument('--cache-max-age', type=float, default=None,
+                        help="evict cache entries not used for this many days")
+    parser.add_argument('--cache-max-entries', type=int, default=None,
+                        help="keep at most this many cache entries, evicting the least recently used")
+    parser.add_argument('--compact-cache', action='store_true', help="vacuum the cache database after the run")
+    parser.add_argument('--io', choices=IO_MODES, default='auto', dest='io_mode',
+                        help="read files through mmap, buffered reads, or mmap for large files only (default: auto)")
+    parser.add_argument('--tree', action='store_true',
+                        help="use chunked tree hashing with a sidecar file of leaf digests")
+    parser.add_argument('--leaf-size', type=int, default=DEFAULT_LEAF_SIZE,
+                        help=f"tree-hash leaf size in bytes (default: {DEFAULT_LEAF_SIZE})")
+    parser.add_argument('--sidecar', help="tree-hash sidecar path (default: <file_path>.merkle)")
+    parser.add_argument('--range', action='append', type=parse_range, dest='ranges',
+                        help="OFFSET:LENGTH byte range to re-verify in tree mode (repeatable)")
+    return parser.parse_args(argv)
+
+def parse_range(value):
+    """
+    Parse an OFFSET:LENGTH byte range argument.
+    """
+    try:
+        offset, length = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid range '{value}', expected OFFSET:LENGTH")
+    if offset < 0 or length <= 0:
+        raise argparse.ArgumentTypeError(f"invalid range '{value}', offset and length must be positive")
+    return offset, length
 
 def main():
     """
@@ -87,30 +1023,39 @@ def main():
     """
     if len(sys.argv) < 3:
         # Ensure that enough arguments are provided
-        print("Usage: python sample.py <generate|validate> <file_path> [<checksum>]")
+        print("Usage: python ChecksumWizard.py <generate|validate> <file_path> [<checksum>] [--workers N] [--algo NAME]")
+        print("       python ChecksumWizard.py generate <directory> [--algo NAME] [--format gnu|bsd] [--output FILE]")
+        print("       python ChecksumWizard.py validate <directory> <manifest> [--algo NAME] [--fail-fast]")
+        print("       python ChecksumWizard.py <generate|validate> <file_path> [<root>] --tree [--range OFFSET:LENGTH]")
         sys.exit(1)  # Exit the script with an error status code
     
     try:
-        purpose = sys.argv[1].lower().strip()
-        file_path = sys.argv[2].strip()
-        checksum = sys.argv[3].strip() if len(sys.argv) == 4 else None  # Optional checksum for 'validate' mode
+        args = parse_arguments(sys.argv[1:])
+        purpose = args.purpose
+        file_path = args.file_path
 
         # Ensure that the purpose argument is either 'generate' or 'validate'
         if purpose not in ['generate', 'validate']:
             raise ChecksumWizardError("Invalid purpose. Must be 'generate' or 'validate'.")
+        if (args.workers is not None and args.workers < 1) or (args.jobs is not None and args.jobs < 1):
+            raise ChecksumWizardError("Number of workers and jobs must be at least 1.")
 
-        # Initialize ChecksumWizard with file path and checksum value
-        wizard = ChecksumWizard(file_path, checksum if purpose == 'validate' else None)
-
-        if purpose == "generate":
-            wizard.source_file_analyzer()  # Read file content
-            wizard.compute_checksum_for_binary_form_data()  # Compute checksums
-        elif purpose == "validate":
-            if checksum is None:
-                raise ChecksumWizardError("Checksum value is required for validation.")
-            wizard.source_file_analyzer()  # Read file content
-            wizard.compute_checksum_for_binary_form_data()  # Compute checksums
-            wizard.verify_checksum()  # Verify the provided checksum
+        cache = ChecksumCache(args.cache) if args.cache else None
+        try:
+            if os.path.isdir(file_path):
+                status = run_directory_mode(args, cache)
+            elif args.tree:
+                status = run_tree_mode(args)
+            else:
+                run_file_mode(args, cache)
+                status = 0
+            if cache is not None:
+                maintain_cache(cache, args)
+        finally:
+            if cache is not None:
+                cache.close()
+        if status:
+            sys.exit(status)
     except KeyboardInterrupt:
         print("Process interrupted by the user.")
         sys.exit(1)  # Exit the script with an error status code
@@ -121,6 +1066,105 @@ def main():
         print(f'Unexpected error occurred: {e}')
         sys.exit(1)  # Exit the script with an error status code
 
+def run_file_mode(args, cache=None):
+    """
+    Generate or validate the checksums of a single file.
+    """
+    if args.purpose == "generate":
+        # Initialize ChecksumWizard with file path and the selected (or all) hash methods
+        wizard = ChecksumWizard(args.file_path, algorithms=candidate_algorithms(None, args.algo) if args.algo else None,
+                                workers=args.workers or 1, cache=cache, paranoid=args.paranoid,
+                                io_mode=args.io_mode)
+        wizard.source_file_analyzer()  # Read file content
+        wizard.compute_checksum_for_binary_form_data()  # Compute checksums
+    elif args.purpose == "validate":
+        if args.checksum is None:
+            raise ChecksumWizardError("Checksum value is required for validation.")
+        # Only compute the hash methods that could have produced the checksum
+        wizard = ChecksumWizard(args.file_path, args.checksum, algorithms=candidate_algorithms(args.checksum, args.algo),
+                                workers=args.workers or 1, cache=cache, paranoid=args.paranoid,
+                                io_mode=args.io_mode)
+        wizard.source_file_analyzer()  # Read file content
+        wizard.compute_checksum_for_binary_form_data()  # Compute checksums
+        wizard.verify_checksum()  # Verify the provided checksum
+
+def run_tree_mode(args):
+    """
+    Compute a tree hash and write its sidecar, or re-verify a file (or some ranges of it) against the sidecar.
+
+    :return: Exit status (0 when every checked leaf, and the root if given, matched).
+    """
+    sidecar_path = args.sidecar or args.file_path + '.merkle'
+    if args.purpose == "generate":
+        if args.leaf_size < 1:
+            raise ChecksumWizardError("Leaf size must be at least 1 byte.")
+        hash_method = candidate_algorithms(None, args.algo or 'sha256')[0]
+        root, leaves, file_size = compute_merkle_tree(args.file_path, hash_method, args.leaf_size, args.workers)
+        write_merkle_sidecar(sidecar_path, hash_method, args.leaf_size, file_size, root, leaves)
+        print(f"tree-{hash_method} ({len(leaves)} x {args.leaf_size}-byte leaves): {root.hex()}")
+        print(f"Leaf digests written to '{sidecar_path}'.")
+        return 0
+
+    sidecar = read_merkle_sidecar(sidecar_path)
+    status = 0
+    if args.checksum and not hmac.compare_digest(decode_checksum(args.checksum), sidecar['root']):
+        print(f"Root mismatch: sidecar root is {sidecar['root'].hex()}.")
+        status = 1
+    file_size = stat_identity(args.file_path)[2]
+    if file_size != sidecar['file_size']:
+        print(f"File size changed: expected {sidecar['file_size']} bytes, found {file_size}.")
+        status = 1
+
+    corrupted = verify_merkle_ranges(args.file_path, sidecar, args.ranges, args.workers)
+    for index in corrupted:
+        offset = index * sidecar['leaf_size']
+        print(f"Chunk {index} (bytes {offset}-{min(offset + sidecar['leaf_size'], sidecar['file_size']) - 1}) is corrupted.")
+    if corrupted:
+        status = 1
+    if not status:
+        print("All checked chunks matched.")
+    return status
+
+def run_directory_mode(args, cache=None):
+    """
+    Generate or validate a manifest for a directory tree.
+
+    :return: Exit status (0 when every file was hashed and, when validating, matched).
+    """
+    if args.purpose == "generate":
+        hash_method = candidate_algorithms(None, args.algo or 'sha256')[0]
+        if not args.output:
+            failures = generate_manifest(args.file_path, hash_method, args.format, args.jobs, cache=cache,
+                                         paranoid=args.paranoid)
+            return 1 if failures else 0
+        try:
+            with open(args.output, 'x', encoding='utf-8', errors='surrogateescape', newline='\n') as output:
+                failures = generate_manifest(args.file_path, hash_method, args.format, args.jobs, output,
+                                             exclude=os.path.abspath(args.output), cache=cache,
+                                             paranoid=args.paranoid)
+        except OSError as e:
+            raise ChecksumWizardError(f"Cannot write manifest '{args.output}': {e}")
+        print(f"Manifest for '{args.file_path}' written to '{args.output}'.")
+        return 1 if failures else 0
+
+    if args.checksum is None:
+        raise ChecksumWizardError("A manifest file is required to validate a directory.")
+    algorithm = candidate_algorithms(None, args.algo)[0] if args.algo else None
+    matched, failed = validate_manifest(args.file_path, args.checksum, algorithm, args.jobs, args.fail_fast,
+                                        cache=cache, paranoid=args.paranoid)
+    print(f"{matched} file(s) OK, {failed} file(s) failed.")
+    return 1 if failed else 0
+
+def maintain_cache(cache, args):
+    """
+    Apply the requested cache eviction and compaction after a run.
+    """
+    if args.cache_max_age is not None or args.cache_max_entries is not None:
+        removed = cache.evict(args.cache_max_age, args.cache_max_entries)
+        print(f"Evicted {removed} cache entries.", file=sys.stderr)
+    if args.compact_cache:
+        cache.compact()
+
 if __name__ == "__main__":
     main()
     sys.exit(0)
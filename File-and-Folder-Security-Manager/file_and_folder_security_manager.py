@@ -1,23 +1,111 @@
-from cryptography.fernet import Fernet
-from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from pathlib import Path, PurePosixPath
+import base64
+import collections
+import hmac
+import itertools
+import json
+import os
+import queue
+import shutil
+import struct
 import sys
+import threading
+
+DEFAULT_MAX_IN_FLIGHT = 256 * 1024 * 1024  # Bytes of files being processed at once in directory mode
+
+# Segmented file format: a header followed by AES-GCM encrypted segments of segment_size plaintext bytes.
+# Each segment is sealed with a nonce holding its index and a final-segment flag, and authenticates the
+# header, so segments cannot be reordered, dropped, truncated or moved between files. Version 2 appends
+# a sealed segment index (plaintext length, segment count and segment offsets) and a trailer holding the
+# index size, so byte ranges can be decrypted without reading the rest of the file.
+STREAM_MAGIC = b'FFSM'
+STREAM_VERSION = 2
+STREAM_VERSIONS = (1, 2)
+STREAM_HEADER = struct.Struct('>4sBI16s')  # Magic, version, segment size, HKDF salt
+SEGMENT_INDEX = struct.Struct('>QQ')  # Plaintext length, segment count; followed by the segment offsets
+SEGMENT_OFFSET = struct.Struct('>Q')
+STREAM_TRAILER = struct.Struct('>Q4s')  # Sealed index size, magic
+STREAM_KEY_INFO = b'file-and-folder-security-manager segment key'
+DEFAULT_SEGMENT_SIZE = 1024 * 1024
+MAX_SEGMENT_SIZE = 64 * 1024 * 1024
+GCM_TAG_SIZE = 16
+PIPELINE_DEPTH = 4  # Segments buffered between the reader, cipher and writer stages
+LEGACY_FERNET_PREFIX = b'gA'  # Base64 of the Fernet version byte 0x80
+
+# Sync mode keeps a Fernet-encrypted JSON index of the source files in the output directory
+SYNC_STATE_NAME = '.fsm-sync-state'
+SYNC_STATE_VERSION = 1
+SYNC_SAVE_INTERVAL = 256  # Completed files between saves of the sync state
+PARTIAL_SUFFIX = '.fsm-partial'  # Outputs are written under this suffix, then renamed into place
+CONTENT_KEY_INFO = b'file-and-folder-security-manager content hash'
+
+# A bundle is a segmented file whose plaintext holds its members back to back, followed by a JSON
+# index of their paths, offsets and sizes and a trailer with the index length.
+BUNDLE_SUFFIX = '.fsmb'
+BUNDLE_MAGIC = b'FSMB'
+BUNDLE_VERSION = 1
+BUNDLE_TRAILER = struct.Struct('>Q4s')  # Index length, magic
+DEFAULT_BUNDLE_SIZE = 1024 * 1024 * 1024  # Bundles are split once their members exceed this size
+
+# Deduplicated directories store every distinct content once under objects/, named by its keyed content
+# hash, next to a Fernet-encrypted manifest mapping the original paths to their objects.
+MANIFEST_NAME = '.fsm-manifest'
+MANIFEST_VERSION = 1
+OBJECTS_DIR = 'objects'
+
+class DirectorySummary:
+    def __init__(self):
+        self.succeeded = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.deduplicated = 0
+        self.bytes_processed = 0
+        self.failed = []  # (path, error message) pairs
+
+    def __str__(self):
+        parts = [f"{self.succeeded} file(s) succeeded"]
+        if self.unchanged:
+            parts.append(f"{self.unchanged} unchanged")
+        if self.removed:
+            parts.append(f"{self.removed} removed")
+        if self.deduplicated:
+            parts.append(f"{self.deduplicated} deduplicated")
+        parts.append(f"{len(self.failed)} file(s) failed.")
+        return ", ".join(parts)
+
+class SegmentLayout:
+    def __init__(self, header, segment_size, plaintext_length, offsets, data_end):
+        self.header = header
+        self.segment_size = segment_size
+        self.plaintext_length = plaintext_length
+        self.offsets = offsets  # File offset of every sealed segment
+        self.data_end = data_end  # File offset where the sealed segments end
+
+    def sealed_size(self, index):
+        following = self.offsets[index + 1] if index + 1 < len(self.offsets) else self.data_end
+        return following - self.offsets[index]
 
 class FileEncryptorDecryptor:
-    def __init__(self, key):
+    def __init__(self, key, workers=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT, segment_size=DEFAULT_SEGMENT_SIZE):
         self.key = key
+        self.workers = workers or os.cpu_count() or 1
+        # Upper bound on the memory held by the files in the worker pool: a segmented file needs at most
+        # its pipeline buffers, while a legacy Fernet file is held in memory in full.
+        self.max_in_flight = max_in_flight
+        if not 0 < segment_size <= MAX_SEGMENT_SIZE:
+            raise ValueError(f"Error: Segment size must be between 1 and {MAX_SEGMENT_SIZE} bytes.")
+        self.segment_size = segment_size
+        self._content_key = None
 
     def encrypt_file(self, input_path, output_path):
         try:
-            input_path, output_path = Path(input_path), Path(output_path)
-            if input_path == output_path:
-                raise ValueError("Error: Input and output file paths cannot be the same.")
-            if output_path.exists():
-                raise FileExistsError("Error: Output file already exists.")
-
-            with input_path.open("rb") as file:
-                data = file.read()
-            encrypted_data = self._encrypt_data(data)
-            self._write_data(output_path, encrypted_data)
+            self._encrypt_path(input_path, output_path)
             print(f"File '{input_path}' encrypted and saved as '{output_path}'.")
         except (FileNotFoundError, FileExistsError, ValueError) as e:
             print(e)
@@ -26,76 +114,887 @@ class FileEncryptorDecryptor:
 
     def decrypt_file(self, input_path, output_path):
         try:
-            input_path, output_path = Path(input_path), Path(output_path)
-            if input_path == output_path:
-                raise ValueError("Error: Input and output file paths cannot be the same.")
-            if output_path.exists():
-                raise FileExistsError("Error: Output file already exists.")
-
-            with input_path.open("rb") as file:
-                encrypted_data = file.read()
-            decrypted_data = self._decrypt_data(encrypted_data)
-            self._write_data(output_path, decrypted_data)
+            self._decrypt_path(input_path, output_path)
             print(f"File '{input_path}' decrypted and saved as '{output_path}'.")
         except (FileNotFoundError, FileExistsError, ValueError) as e:
             print(e)
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
 
-    def encrypt_directory(self, input_dir, output_dir):
+    def encrypt_directory(self, input_dir, output_dir, dedup=False):
+        """
+        Encrypt every file of a directory into the same layout under output_dir. With dedup, identical
+        files are encrypted and stored only once, and a manifest records which object each path uses.
+        """
+        return self._process_directory(input_dir, output_dir, decrypt=False, dedup=dedup)
+
+    def decrypt_directory(self, input_dir, output_dir):
+        return self._process_directory(input_dir, output_dir, decrypt=True)
+
+    def sync_directory(self, input_dir, output_dir):
+        """
+        Bring an encrypted copy of a directory up to date: only new and changed files are encrypted,
+        and outputs of deleted files are removed. A state index of each file's size, modification time
+        and keyed content hash is kept in the output directory; files whose modification time changed
+        but whose content did not are not encrypted again. Every output is written to a temporary file
+        and renamed into place, and the index is saved as files complete, so an interrupted run can
+        simply be repeated.
+        """
+        try:
+            input_dir, output_dir = Path(input_dir), Path(output_dir)
+            if input_dir == output_dir:
+                raise ValueError("Error: Input and output directories cannot be the same.")
+            if not input_dir.is_dir():
+                raise FileNotFoundError(f"Error: Input directory '{input_dir}' not found.")
+            state_path = output_dir / SYNC_STATE_NAME
+            if output_dir.exists() and not state_path.exists() and any(output_dir.iterdir()):
+                raise FileExistsError("Error: Output directory exists and was not created by a sync.")
+
+            output_dir.mkdir(parents=True, exist_ok=True)
+            state = self._load_sync_state(state_path)
+
+            summary = DirectorySummary()
+            sources, tasks, reserved = {}, [], set()
+            for file in input_dir.glob("**/*"):
+                if not file.is_file():
+                    continue
+                relative = file.relative_to(input_dir).as_posix()
+                if relative == SYNC_STATE_NAME:
+                    summary.failed.append((file, "Error: File name is reserved for the sync state."))
+                    continue
+                if file.name.endswith(PARTIAL_SUFFIX):
+                    # Its output would be taken for a temporary file; an output kept from an earlier run stays
+                    summary.failed.append((file, f"Error: File names ending in '{PARTIAL_SUFFIX}' are reserved."))
+                    reserved.add(relative)
+                    continue
+                stat = file.stat()
+                entry, output_path = state.get(relative), output_dir / relative
+                expected = None
+                if entry is not None and entry['size'] == stat.st_size and output_path.exists():
+                    if entry['mtime_ns'] == stat.st_mtime_ns:
+                        summary.unchanged += 1
+                        sources[file] = (relative, stat.st_size, stat.st_mtime_ns, None)
+                        continue
+                    expected = entry['hash']  # Rehash; encrypt only if the content changed
+                sources[file] = (relative, stat.st_size, stat.st_mtime_ns, expected)
+                tasks.append((file, output_path, expected))
+
+            seen = {source[0] for source in sources.values()} | reserved
+            written = seen | set(state) | {SYNC_STATE_NAME}
+            for partial in output_dir.glob(f"**/*{PARTIAL_SUFFIX}"):
+                # Only the temporary files this sync writes, left behind by an interrupted run
+                relative = partial.relative_to(output_dir).as_posix()
+                if relative[:-len(PARTIAL_SUFFIX)] in written and relative not in state and partial.is_file():
+                    partial.unlink()
+
+            for relative in sorted(set(state) - seen):
+                output_path = output_dir / relative
+                output_path.unlink(missing_ok=True)
+                _remove_empty_parents(output_path.parent, output_dir)
+                del state[relative]
+                summary.removed += 1
+
+            completed = 0
+
+            def on_done(path, digest):
+                nonlocal completed
+                relative, size, mtime_ns, expected = sources[path]
+                state[relative] = {'size': size, 'mtime_ns': mtime_ns, 'hash': digest}
+                completed += 1
+                if completed % SYNC_SAVE_INTERVAL == 0:
+                    self._save_sync_state(state_path, state)
+                return expected is None or digest != expected
+
+            try:
+                self._run_tasks(tasks, "sync", summary, on_done)
+            finally:
+                self._save_sync_state(state_path, state)
+
+            for path, error in summary.failed:
+                print(f"Failed: '{path}': {error}")
+            print(f"Directory '{input_dir}' synced to '{output_dir}': {summary}")
+            return summary
+        except (FileNotFoundError, FileExistsError, ValueError) as e:
+            print(e)
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+
+    def bundle_directory(self, input_dir, output_dir, max_bundle_size=DEFAULT_BUNDLE_SIZE):
+        """
+        Pack the files of a directory into encrypted bundles, starting a new bundle whenever the next
+        file would take the members past max_bundle_size. Bundles are written on the worker pool.
+        """
         try:
             input_dir, output_dir = Path(input_dir), Path(output_dir)
             if input_dir == output_dir:
                 raise ValueError("Error: Input and output directories cannot be the same.")
             if output_dir.exists():
                 raise FileExistsError("Error: Output directory already exists.")
+            if not input_dir.is_dir():
+                raise FileNotFoundError(f"Error: Input directory '{input_dir}' not found.")
+
+            bundles, members, bundle_size = [], [], 0
+            for file in sorted(input_dir.glob("**/*")):
+                if not file.is_file():
+                    continue
+                size = file.stat().st_size
+                if members and bundle_size + size > max_bundle_size:
+                    bundles.append(members)
+                    members, bundle_size = [], 0
+                members.append(file.relative_to(input_dir).as_posix())
+                bundle_size += size
+            if members:
+                bundles.append(members)
 
             output_dir.mkdir(parents=True, exist_ok=True)
+            tasks = [(input_dir, bundle_members, output_dir / f"bundle-{number:05d}{BUNDLE_SUFFIX}")
+                     for number, bundle_members in enumerate(bundles)]
+            summary = self._run_bundle_tasks(_write_bundle, tasks)
 
-            for file in input_dir.glob("**/*"):
-                if file.is_file():
-                    output_file = output_dir / file.relative_to(input_dir)
-                    self.encrypt_file(file, output_file)
-                    
-            print(f"All files in directory '{input_dir}' encrypted and saved in '{output_dir}'.")
+            for path, error in summary.failed:
+                print(f"Failed: '{path}': {error}")
+            print(f"Files in directory '{input_dir}' packed into {len(bundles)} bundle(s) in '{output_dir}': {summary}")
+            return summary
         except (FileNotFoundError, FileExistsError, ValueError) as e:
             print(e)
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
 
-    def decrypt_directory(self, input_dir, output_dir):
+    def unbundle_directory(self, input_dir, output_dir):
         try:
             input_dir, output_dir = Path(input_dir), Path(output_dir)
             if input_dir == output_dir:
                 raise ValueError("Error: Input and output directories cannot be the same.")
             if output_dir.exists():
                 raise FileExistsError("Error: Output directory already exists.")
+            bundles = sorted(input_dir.glob(f"*{BUNDLE_SUFFIX}"))
+            if not bundles:
+                raise FileNotFoundError(f"Error: No bundles found in '{input_dir}'.")
 
             output_dir.mkdir(parents=True, exist_ok=True)
+            summary = self._run_bundle_tasks(_extract_bundle, [(output_dir, bundle) for bundle in bundles])
 
-            for file in input_dir.glob("**/*"):
-                if file.is_file():
-                    output_file = output_dir / file.relative_to(input_dir)
-                    self.decrypt_file(file, output_file)
+            for path, error in summary.failed:
+                print(f"Failed: '{path}': {error}")
+            print(f"Bundles in directory '{input_dir}' extracted to '{output_dir}': {summary}")
+            return summary
+        except (FileNotFoundError, FileExistsError, ValueError) as e:
+            print(e)
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+
+    def list_bundle(self, bundle_path):
+        """
+        :return: The members of a bundle as dictionaries with 'path', 'offset', 'size' and 'mtime_ns'.
+        """
+        with Path(bundle_path).open("rb") as source:
+            return self._read_bundle_index(self._open_container(source))
+
+    def extract_member(self, bundle_path, member, output_path):
+        """
+        Extract a single member of a bundle, decrypting only the segments that hold it.
+
+        :return: The size of the member.
+        """
+        output_path = Path(output_path)
+        if output_path.exists():
+            raise FileExistsError("Error: Output file already exists.")
+        with Path(bundle_path).open("rb") as source:
+            reader = self._open_container(source)
+            for entry in self._read_bundle_index(reader):
+                if entry['path'] == member:
+                    output_path.parent.mkdir(parents=True, exist_ok=True)
+                    self._extract_entry(reader, entry, output_path)
+                    return entry['size']
+        raise FileNotFoundError(f"Error: '{member}' is not a member of '{bundle_path}'.")
+
+    def _read_bundle_index(self, reader):
+        length = reader.layout.plaintext_length
+        if length < BUNDLE_TRAILER.size:
+            raise ValueError("Error: File is not a bundle.")
+        index_length, magic = BUNDLE_TRAILER.unpack(reader.read(length - BUNDLE_TRAILER.size, BUNDLE_TRAILER.size))
+        if magic != BUNDLE_MAGIC or index_length > length - BUNDLE_TRAILER.size:
+            raise ValueError("Error: File is not a bundle.")
+        index = json.loads(reader.read(length - BUNDLE_TRAILER.size - index_length, index_length))
+        if index.get('version') != BUNDLE_VERSION:
+            raise ValueError(f"Error: Unsupported bundle version {index.get('version')}.")
+        return [dict(zip(('path', 'offset', 'size', 'mtime_ns'), member)) for member in index['members']]
+
+    def _extract_entry(self, reader, entry, output_path):
+        with _OutputFile(output_path) as target:
+            end = entry['offset'] + entry['size']
+            for offset in range(entry['offset'], end, self.segment_size):
+                target.write(reader.read(offset, min(self.segment_size, end - offset)))
+        os.utime(output_path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+
+    def _run_bundle_tasks(self, function, tasks):
+        # Each task handles the bundle named by its last element and returns (members done, bytes, failed members)
+        summary = DirectorySummary()
+
+        def record(path, run):
+            try:
+                succeeded, size, failed = run()
+            except Exception as e:
+                summary.failed.append((path, describe_error(e)))
+                return
+            summary.succeeded += succeeded
+            summary.bytes_processed += size
+            summary.failed.extend(failed)
+
+        if self.workers == 1 or len(tasks) < 2:
+            for task in tasks:
+                record(task[-1], lambda: function(self, *task))
+            return summary
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+            futures = [(task[-1], pool.submit(function, self._worker_settings(), *task)) for task in tasks]
+            for path, future in futures:
+                record(path, future.result)
+        return summary
 
-            print(f"All files in directory '{input_dir}' decrypted and saved in '{output_dir}'.")
+    def _load_sync_state(self, state_path):
+        if not state_path.exists():
+            return {}
+        try:
+            state = json.loads(self._decrypt_data(state_path.read_bytes()))
+        except ValueError:
+            raise ValueError("Error: Sync state cannot be read with this key.")
+        if state.get('version') != SYNC_STATE_VERSION:
+            raise ValueError(f"Error: Unsupported sync state version {state.get('version')}.")
+        return state['files']
+
+    def _save_sync_state(self, state_path, files):
+        document = json.dumps({'version': SYNC_STATE_VERSION, 'files': files}, sort_keys=True)
+        partial = state_path.with_name(state_path.name + PARTIAL_SUFFIX)
+        self._write_data(partial, Fernet(self.key).encrypt(document.encode()))
+        os.replace(partial, state_path)
+
+    def _content_hasher(self):
+        # Keyed hash of file contents, so the sync state does not reveal the hashes of known files
+        if self._content_key is None:
+            hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=CONTENT_KEY_INFO)
+            self._content_key = hkdf.derive(base64.urlsafe_b64decode(self.key))
+        return hmac.new(self._content_key, digestmod='sha256')
+
+    def _process_directory(self, input_dir, output_dir, decrypt, dedup=False):
+        action = "decrypted" if decrypt else "encrypted"
+        try:
+            input_dir, output_dir = Path(input_dir), Path(output_dir)
+            if input_dir == output_dir:
+                raise ValueError("Error: Input and output directories cannot be the same.")
+            if output_dir.exists():
+                raise FileExistsError("Error: Output directory already exists.")
+            if not input_dir.is_dir():
+                raise FileNotFoundError(f"Error: Input directory '{input_dir}' not found.")
+
+            output_dir.mkdir(parents=True, exist_ok=True)
+            if decrypt and (input_dir / MANIFEST_NAME).exists():
+                summary = self._restore_deduplicated(input_dir, output_dir)
+            elif dedup:
+                summary = self._encrypt_deduplicated(input_dir, output_dir)
+            else:
+                tasks = [(file, output_dir / file.relative_to(input_dir), None) for file in input_dir.glob("**/*")
+                         if file.is_file() and not (decrypt and file == input_dir / SYNC_STATE_NAME)]
+                summary = self._run_tasks(tasks, "decrypt" if decrypt else "encrypt", DirectorySummary())
+
+            for path, error in summary.failed:
+                print(f"Failed: '{path}': {error}")
+            print(f"Files in directory '{input_dir}' {action} and saved in '{output_dir}': {summary}")
+            return summary
         except (FileNotFoundError, FileExistsError, ValueError) as e:
             print(e)
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
 
-    def _encrypt_data(self, data):
-        fernet = Fernet(self.key)
-        return fernet.encrypt(data)
+    def _encrypt_deduplicated(self, input_dir, output_dir):
+        # Files are grouped by size first: a file with a unique size cannot have a duplicate, so it is
+        # hashed while it is encrypted. Files sharing a size are hashed first, and one file per distinct
+        # hash is then encrypted.
+        summary, objects_dir = DirectorySummary(), output_dir / OBJECTS_DIR
+        files, by_size = {}, {}
+        for file in sorted(input_dir.glob("**/*")):
+            if file.is_file():
+                stat = file.stat()
+                files[file] = (file.relative_to(input_dir).as_posix(), stat.st_size, stat.st_mtime_ns)
+                by_size.setdefault(stat.st_size, []).append(file)
+
+        object_ids = {}
+
+        def on_done(path, digest):
+            object_ids[path] = digest
+            return True
+
+        def store_tasks(paths):
+            return [(path, objects_dir / f"{number}{PARTIAL_SUFFIX}", None) for number, path in enumerate(paths)]
+
+        unique = [paths[0] for paths in by_size.values() if len(paths) == 1]
+        shared = [path for paths in by_size.values() if len(paths) > 1 for path in paths]
+        self._run_tasks(store_tasks(unique), "store", summary, on_done)
+
+        hashing = DirectorySummary()
+        self._run_tasks([(path, objects_dir, None) for path in shared], "hash", hashing, on_done)  # Writes nothing
+        summary.failed.extend(hashing.failed)
+        representatives = {}
+        for path in shared:
+            if path in object_ids:
+                representatives.setdefault(object_ids[path], path)
+        expected = {path: object_id for object_id, path in representatives.items()}
+        stored = set()
+
+        def on_stored(path, digest):
+            if digest == expected[path]:
+                stored.add(digest)
+            object_ids[path] = digest  # Differs only if the file changed after it was hashed
+            return True
+
+        self._run_tasks(store_tasks(list(representatives.values())), "store", summary, on_stored)
+        for path in shared:
+            if path in object_ids and path not in expected and object_ids[path] not in stored:
+                del object_ids[path]
+                summary.failed.append((path, "Error: An identical file changed during encryption."))
+
+        manifest = {}
+        for path, object_id in object_ids.items():
+            relative, size, mtime_ns = files[path]
+            manifest[relative] = [object_id, size, mtime_ns]
+        document = json.dumps({'version': MANIFEST_VERSION, 'files': manifest}, sort_keys=True)
+        self._write_data(output_dir / MANIFEST_NAME, Fernet(self.key).encrypt(document.encode()))
+        summary.succeeded = len(manifest)
+        summary.deduplicated = len(manifest) - len({entry[0] for entry in manifest.values()})
+        return summary
+
+    def _restore_deduplicated(self, input_dir, output_dir):
+        # Each object is decrypted once; further paths with the same content are copied from the first
+        try:
+            manifest = json.loads(self._decrypt_data((input_dir / MANIFEST_NAME).read_bytes()))
+        except ValueError:
+            raise ValueError("Error: Manifest cannot be read with this key.")
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Error: Unsupported manifest version {manifest.get('version')}.")
+
+        objects_dir, first, copies = input_dir / OBJECTS_DIR, {}, []
+        for relative, (object_id, _, _) in sorted(manifest['files'].items()):
+            member = PurePosixPath(relative)
+            if member.is_absolute() or '..' in member.parts:
+                raise ValueError(f"Error: Manifest path '{relative}' leaves the output directory.")
+            if object_id in first:
+                copies.append((object_id, output_dir / relative))
+            else:
+                first[object_id] = output_dir / relative
+        tasks = [(_object_path(objects_dir, object_id), output_path, None) for object_id, output_path in first.items()]
+        summary = self._run_tasks(tasks, "decrypt", DirectorySummary())
+
+        failed = {path for path, _ in summary.failed}
+        for object_id, output_path in copies:
+            try:
+                if _object_path(objects_dir, object_id) in failed:
+                    raise ValueError("Error: Object could not be decrypted.")
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(first[object_id], output_path)
+            except (OSError, ValueError) as e:
+                summary.failed.append((output_path, describe_error(e)))
+                continue
+            summary.succeeded += 1
+            summary.deduplicated += 1
+        for relative, (_, _, mtime_ns) in manifest['files'].items():
+            if (output_dir / relative).exists():
+                os.utime(output_dir / relative, ns=(mtime_ns, mtime_ns))
+        return summary
+
+    def _run_tasks(self, tasks, operation, summary, on_done=None):
+        # Run (input path, output path, expected content hash) tasks; on_done(input path, content hash)
+        # returns whether the output was written, or the file counts as unchanged.
+        def record(path, run):
+            try:
+                size, digest = run()
+            except Exception as e:
+                summary.failed.append((path, describe_error(e)))
+                return
+            summary.bytes_processed += size
+            if on_done is None or on_done(path, digest):
+                summary.succeeded += 1
+            else:
+                summary.unchanged += 1
+
+        if self.workers == 1:
+            for input_path, output_path, expected in tasks:
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                record(input_path, lambda: _transform_file(self, operation, input_path, output_path, expected))
+            return summary
+
+        # Files are admitted to the pool while their combined size stays under max_in_flight;
+        # a file larger than the cap on its own is admitted once the pool has drained.
+        in_flight, pending = 0, {}
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for input_path, output_path, expected in tasks:
+                try:
+                    size = self._memory_estimate(input_path, operation == "decrypt")
+                    output_path.parent.mkdir(parents=True, exist_ok=True)
+                except OSError as e:
+                    summary.failed.append((input_path, describe_error(e)))
+                    continue
+                while pending and in_flight + size > self.max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, done_size = pending.pop(future)
+                        in_flight -= done_size
+                        record(path, future.result)
+                future = pool.submit(_transform_file, self._worker_settings(), operation, input_path, output_path,
+                                     expected)
+                pending[future] = (input_path, size)
+                in_flight += size
+            for future, (path, _) in pending.items():
+                record(path, future.result)
+        return summary
+
+    def _worker_settings(self):
+        return self.key, self.segment_size
+
+    def _memory_estimate(self, input_path, decrypt):
+        size = input_path.stat().st_size
+        pipeline_size = 2 * PIPELINE_DEPTH * (self.segment_size + GCM_TAG_SIZE)
+        if size <= pipeline_size or (decrypt and _is_legacy_file(input_path)):
+            return size
+        return pipeline_size
+
+    def _encrypt_path(self, input_path, output_path, content_hash=None):
+        input_path, output_path = self._check_paths(input_path, output_path)
+        with input_path.open("rb") as source, _OutputFile(output_path) as target:
+            return self._write_container(source, target, content_hash)
+
+    def _write_container(self, source, target, content_hash=None):
+        # Encrypt everything read from source into target; returns the plaintext length
+        salt = os.urandom(16)
+        header = STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION, self.segment_size, salt)
+        cipher = AESGCM(self._segment_key(salt))
+
+        plaintext_length, offsets = 0, []
+
+        def encrypt(segment):
+            nonlocal plaintext_length
+            index, data, final = segment
+            plaintext_length += len(data)
+            return cipher.encrypt(_segment_nonce(index, final), data, header)
+
+        def write(sealed):
+            offsets.append(target.tell())
+            target.write(sealed)
+
+        target.write(header)
+        segments = _read_segments(source, self.segment_size)
+        if content_hash is not None:
+            segments = _hash_segments(segments, content_hash)
+        _run_pipeline(segments, encrypt, write)
+        index = SEGMENT_INDEX.pack(plaintext_length, len(offsets))
+        index += b''.join(SEGMENT_OFFSET.pack(offset) for offset in offsets)
+        sealed_index = cipher.encrypt(_segment_nonce(0, final=False, index_block=True), index, header)
+        target.write(sealed_index + STREAM_TRAILER.pack(len(sealed_index), STREAM_MAGIC))
+        return plaintext_length
+
+    def _decrypt_path(self, input_path, output_path):
+        input_path, output_path = self._check_paths(input_path, output_path)
+        with input_path.open("rb") as source:
+            header = source.read(STREAM_HEADER.size)
+            if not header.startswith(STREAM_MAGIC):
+                if not header.startswith(LEGACY_FERNET_PREFIX):
+                    raise ValueError("Error: Input file is not an encrypted file.")
+                encrypted_data = header + source.read()
+                self._write_data(output_path, self._decrypt_data(encrypted_data))
+                return len(encrypted_data)
+
+            cipher, layout = self._read_layout(source, header)
+
+            def decrypt(segment):
+                index, data, final = segment
+                return _open_segment(cipher, layout.header, index, final, data)
+
+            source.seek(STREAM_HEADER.size)
+            segments = _read_segments(source, layout.segment_size + GCM_TAG_SIZE, layout.data_end - source.tell())
+            with _OutputFile(output_path) as target:
+                _run_pipeline(segments, decrypt, target.write)
+            return source.tell()
+
+    def read_range(self, path, offset, length):
+        """
+        Decrypt a byte range of an encrypted file, reading and decrypting only the segments it overlaps.
+
+        :param path: Path to a file written by encrypt_file() or encrypt_directory().
+        :param offset: Offset of the range in the plaintext.
+        :param length: Length of the range; ranges past the end of the plaintext are shortened.
+        :return: The plaintext bytes of the range.
+        """
+        if offset < 0 or length < 0:
+            raise ValueError("Error: Offset and length cannot be negative.")
+        with Path(path).open("rb") as source:
+            return self._open_container(source).read(offset, length)
+
+    def _open_container(self, source):
+        header = source.read(STREAM_HEADER.size)
+        if not header.startswith(STREAM_MAGIC):
+            raise ValueError("Error: Only segmented encrypted files support range reads.")
+        cipher, layout = self._read_layout(source, header)
+        return _ContainerReader(source, cipher, layout)
+
+    def _read_layout(self, source, header):
+        # Parse the header and locate the segments: from the sealed index in version 2 files, or from
+        # the file size in version 1 files, whose segments all have the same sealed size.
+        if len(header) < STREAM_HEADER.size:
+            raise ValueError("Error: Encrypted file is truncated.")
+        _, version, segment_size, salt = STREAM_HEADER.unpack(header)
+        if version not in STREAM_VERSIONS:
+            raise ValueError(f"Error: Unsupported encrypted file version {version}.")
+        if not 0 < segment_size <= MAX_SEGMENT_SIZE:
+            raise ValueError("Error: Encrypted file header is corrupted.")
+        cipher = AESGCM(self._segment_key(salt))
+        file_size = os.fstat(source.fileno()).st_size
+        sealed_segment_size = segment_size + GCM_TAG_SIZE
+
+        if version == 1:
+            count = max(1, -(-(file_size - STREAM_HEADER.size) // sealed_segment_size))
+            offsets = [STREAM_HEADER.size + index * sealed_segment_size for index in range(count)]
+            plaintext_length = max(0, file_size - STREAM_HEADER.size - count * GCM_TAG_SIZE)
+            return cipher, SegmentLayout(header, segment_size, plaintext_length, offsets, file_size)
+
+        if file_size < STREAM_HEADER.size + STREAM_TRAILER.size:
+            raise ValueError("Error: Encrypted file is truncated.")
+        source.seek(file_size - STREAM_TRAILER.size)
+        index_size, magic = STREAM_TRAILER.unpack(source.read(STREAM_TRAILER.size))
+        data_end = file_size - STREAM_TRAILER.size - index_size
+        if magic != STREAM_MAGIC or data_end < STREAM_HEADER.size:
+            raise ValueError("Error: Encrypted file is truncated or corrupted.")
+        source.seek(data_end)
+        try:
+            sealed_index = source.read(index_size)
+            index = cipher.decrypt(_segment_nonce(0, final=False, index_block=True), sealed_index, header)
+        except InvalidTag:
+            raise ValueError("Error: Invalid key or corrupted data.")
+        plaintext_length, count = SEGMENT_INDEX.unpack_from(index)
+        if count < 1 or len(index) != SEGMENT_INDEX.size + count * SEGMENT_OFFSET.size:
+            raise ValueError("Error: Encrypted file index is corrupted.")
+        offsets = [offset for (offset,) in SEGMENT_OFFSET.iter_unpack(index[SEGMENT_INDEX.size:])]
+        return cipher, SegmentLayout(header, segment_size, plaintext_length, offsets, data_end)
+
+    def _segment_key(self, salt):
+        # Per-file AES-256 key derived from the Fernet key, so the same key serves both formats
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=STREAM_KEY_INFO)
+        return hkdf.derive(base64.urlsafe_b64decode(self.key))
+
+    def _check_paths(self, input_path, output_path):
+        input_path, output_path = Path(input_path), Path(output_path)
+        if input_path == output_path:
+            raise ValueError("Error: Input and output file paths cannot be the same.")
+        if output_path.exists():
+            raise FileExistsError("Error: Output file already exists.")
+        return input_path, output_path
 
     def _decrypt_data(self, encrypted_data):
         fernet = Fernet(self.key)
-        return fernet.decrypt(encrypted_data)
+        try:
+            return fernet.decrypt(encrypted_data)
+        except InvalidToken:
+            raise ValueError("Error: Invalid key or corrupted data.")
 
     def _write_data(self, file_path, data):
         with file_path.open("wb") as file:
             file.write(data)
 
+def _worker_encryptor(settings):
+    # Worker functions receive either the encryptor itself (when run inline) or its settings
+    if isinstance(settings, FileEncryptorDecryptor):
+        return settings
+    key, segment_size = settings
+    return FileEncryptorDecryptor(key, workers=1, segment_size=segment_size)
+
+def _transform_file(settings, operation, input_path, output_path, expected=None):
+    # Runs in the worker processes, where only the settings and the paths cross the process boundary;
+    # returns the bytes read and, for 'sync', 'hash' and 'store', the content hash of the input.
+    encryptor_decryptor = _worker_encryptor(settings)
+    if operation == "decrypt":
+        return encryptor_decryptor._decrypt_path(input_path, output_path), None
+    if operation == "encrypt":
+        return encryptor_decryptor._encrypt_path(input_path, output_path), None
+    if operation == "hash":
+        return _hash_file(encryptor_decryptor, input_path)
+    if operation == "store":
+        # Encrypt under a temporary name, then move the object to the name given by its content hash
+        content_hash = encryptor_decryptor._content_hasher()
+        size = encryptor_decryptor._encrypt_path(input_path, output_path, content_hash)
+        object_path = _object_path(output_path.parent, content_hash.hexdigest())
+        object_path.parent.mkdir(exist_ok=True)
+        os.replace(output_path, object_path)
+        return size, content_hash.hexdigest()
+
+    if expected is not None:
+        size, digest = _hash_file(encryptor_decryptor, input_path)
+        if hmac.compare_digest(digest, expected):
+            return 0, expected  # Only the modification time changed
+    content_hash = encryptor_decryptor._content_hasher()
+    partial = output_path.with_name(output_path.name + PARTIAL_SUFFIX)
+    partial.unlink(missing_ok=True)
+    size = encryptor_decryptor._encrypt_path(input_path, partial, content_hash)
+    os.replace(partial, output_path)
+    return size, content_hash.hexdigest()
+
+def _hash_file(encryptor_decryptor, input_path):
+    content_hash, size = encryptor_decryptor._content_hasher(), 0
+    with open(input_path, "rb") as source:
+        for _, data, _ in _read_segments(source, encryptor_decryptor.segment_size):
+            content_hash.update(data)
+            size += len(data)
+    return size, content_hash.hexdigest()
+
+def _object_path(objects_dir, object_id):
+    return objects_dir / object_id[:2] / object_id
+
+def _write_bundle(settings, input_dir, members, bundle_path):
+    encryptor_decryptor = _worker_encryptor(settings)
+    source = _BundleSource(input_dir, members)
+    try:
+        with _OutputFile(bundle_path) as target:
+            encryptor_decryptor._write_container(source, target)
+    finally:
+        source.close()
+    return len(source.index), sum(member[2] for member in source.index), source.failed
+
+def _extract_bundle(settings, output_dir, bundle_path):
+    encryptor_decryptor = _worker_encryptor(settings)
+    succeeded, size, failed = 0, 0, []
+    directories = set()
+    with bundle_path.open("rb") as source:
+        reader = encryptor_decryptor._open_container(source)
+        for entry in encryptor_decryptor._read_bundle_index(reader):
+            output_path = output_dir / entry['path']
+            try:
+                member = PurePosixPath(entry['path'])
+                if member.is_absolute() or '..' in member.parts:
+                    raise ValueError("Error: Member path leaves the output directory.")
+                if output_path.parent not in directories:
+                    output_path.parent.mkdir(parents=True, exist_ok=True)
+                    directories.add(output_path.parent)
+                encryptor_decryptor._extract_entry(reader, entry, output_path)
+            except (OSError, ValueError) as e:
+                failed.append((f"{bundle_path}:{entry['path']}", describe_error(e)))
+                continue
+            succeeded += 1
+            size += entry['size']
+    return succeeded, size, failed
+
+def describe_error(error):
+    return str(error) or type(error).__name__
+
+def _is_legacy_file(path):
+    with open(path, "rb") as file:
+        return file.read(len(LEGACY_FERNET_PREFIX)) == LEGACY_FERNET_PREFIX
+
+def _remove_empty_parents(directory, root):
+    while directory != root and directory.is_dir() and not any(directory.iterdir()):
+        directory.rmdir()
+        directory = directory.parent
+
+def _hash_segments(segments, content_hash):
+    for segment in segments:
+        content_hash.update(segment[1])
+        yield segment
+
+def _segment_nonce(index, final, index_block=False):
+    return index.to_bytes(11, 'big') + bytes([2 if index_block else 1 if final else 0])
+
+def _open_segment(cipher, header, index, final, sealed):
+    try:
+        return cipher.decrypt(_segment_nonce(index, final), sealed, header)
+    except InvalidTag:
+        raise ValueError("Error: Invalid key or corrupted data.")
+
+def _read_segments(file, size, limit=None):
+    # Yield (index, data, final) for consecutive chunks, reading one ahead to flag the last one;
+    # an empty file still yields one (empty) final segment. limit caps the bytes read.
+    def read():
+        nonlocal limit
+        if limit is None:
+            return file.read(size)
+        data = file.read(min(size, limit))
+        limit -= len(data)
+        return data
+
+    index, data = 0, read()
+    while True:
+        following = read()
+        yield index, data, not following
+        if not following:
+            return
+        index, data = index + 1, following
+
+_END = object()  # Marks the end of a pipeline queue
+
+def _run_pipeline(items, transform, consume, depth=PIPELINE_DEPTH):
+    """
+    Run items through transform on the calling thread, while a reader thread produces the items and a
+    writer thread consumes the results; the stages are joined by bounded queues so I/O overlaps the
+    cipher without buffering more than depth items each. Inputs of at most depth items are processed
+    inline, since starting the threads costs more than the overlap saves for them.
+
+    :raises: The first exception raised by any stage, after all threads have stopped.
+    """
+    remaining = iter(items)
+    head = collections.deque(itertools.islice(remaining, depth + 1))
+    if len(head) <= depth:
+        for item in head:
+            consume(transform(item))
+        return
+
+    def replay():
+        # Hand the items read ahead to the reader thread without keeping them referenced here
+        while head:
+            yield head.popleft()
+        yield from remaining
+
+    inbound, outbound = queue.Queue(depth), queue.Queue(depth)
+    stop = threading.Event()
+    errors = []
+
+    def put(target, item):
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def drain(source):
+        while not stop.is_set():
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return
+            yield item
+
+    def feed(target, stage_items):
+        try:
+            for item in stage_items:
+                if not put(target, item):
+                    return
+            put(target, _END)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def write():
+        try:
+            for item in drain(outbound):
+                consume(item)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    reader = threading.Thread(target=feed, args=(inbound, replay()), daemon=True)
+    writer = threading.Thread(target=write, daemon=True)
+    reader.start()
+    writer.start()
+    try:
+        feed(outbound, (transform(item) for item in drain(inbound)))
+        writer.join()
+    finally:
+        stop.set()  # Releases a reader still blocked on a full queue after a failure
+        reader.join()
+        writer.join()
+    if errors:
+        raise errors[0]
+
+class _ContainerReader:
+    # Random access to the plaintext of an open segmented file; the last decrypted segment is kept,
+    # so consecutive small reads do not decrypt the same segment again.
+    def __init__(self, source, cipher, layout):
+        self.source = source
+        self.cipher = cipher
+        self.layout = layout
+        self.cached_index, self.cached_data = None, None
+
+    def read(self, offset, length):
+        layout = self.layout
+        end = min(offset + length, layout.plaintext_length)
+        if offset >= end:
+            return b''
+        first, last = offset // layout.segment_size, (end - 1) // layout.segment_size
+        pieces = [self._segment(index) for index in range(first, last + 1)]
+        start = offset - first * layout.segment_size
+        return b''.join(pieces)[start:start + end - offset]
+
+    def _segment(self, index):
+        if index != self.cached_index:
+            self.source.seek(self.layout.offsets[index])
+            sealed = self.source.read(self.layout.sealed_size(index))
+            final = index == len(self.layout.offsets) - 1
+            self.cached_data = _open_segment(self.cipher, self.layout.header, index, final, sealed)
+            self.cached_index = index
+        return self.cached_data
+
+class _BundleSource:
+    # File-like source for a bundle: the member files back to back, then the bundle index and trailer.
+    # Members that cannot be opened are left out of the bundle and reported in failed.
+    def __init__(self, root, members):
+        self.root = root
+        self.members = iter(members)
+        self.index = []  # [path, offset, size, mtime_ns] per member
+        self.failed = []
+        self.position = 0
+        self.current = None
+        self.tail = None
+
+    def read(self, size):
+        chunks = []
+        while size > 0:
+            if self.tail is not None:
+                chunk, self.tail = self.tail[:size], self.tail[size:]
+                if not chunk:
+                    break
+            elif self.current is None:
+                self._open_next()
+                continue
+            else:
+                chunk = self.current.read(size)
+                if not chunk:
+                    self.current.close()
+                    self.current = None
+                    continue
+                self.index[-1][2] += len(chunk)
+            chunks.append(chunk)
+            size -= len(chunk)
+            self.position += len(chunk)
+        return b''.join(chunks)
+
+    def _open_next(self):
+        for relative in self.members:
+            try:
+                self.current = (self.root / relative).open("rb")
+            except OSError as e:
+                self.failed.append((self.root / relative, describe_error(e)))
+                continue
+            self.index.append([relative, self.position, 0, os.fstat(self.current.fileno()).st_mtime_ns])
+            return
+        index = json.dumps({'version': BUNDLE_VERSION, 'members': self.index}).encode()
+        self.tail = index + BUNDLE_TRAILER.pack(len(index), BUNDLE_MAGIC)
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+
+class _OutputFile:
+    # Opens a new output file and removes it again if writing it fails part-way
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.file = self.path.open("xb")
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+        if exc_type is not None:
+            self.path.unlink(missing_ok=True)
+        return False
+
 def main():
     key = Fernet.generate_key()
     encryptor_decryptor = FileEncryptorDecryptor(key)
@@ -107,7 +1006,10 @@ def main():
             print("2. Decrypt File")
             print("3. Encrypt Directory")
             print("4. Decrypt Directory")
-            print("5. Exit")
+            print("5. Sync Directory")
+            print("6. Bundle Directory")
+            print("7. Extract Bundles")
+            print("8. Exit")
 
             choice = input("Enter your choice: ")
 
@@ -122,12 +1024,25 @@ def main():
             elif choice == '3':
                 input_dir = input("Enter input directory path: ")
                 output_dir = input("Enter output directory path: ")
-                encryptor_decryptor.encrypt_directory(input_dir, output_dir)
+                dedup = input("Store identical files only once? (yes/no): ").strip().lower() == 'yes'
+                encryptor_decryptor.encrypt_directory(input_dir, output_dir, dedup=dedup)
             elif choice == '4':
                 input_dir = input("Enter input directory path: ")
                 output_dir = input("Enter output directory path: ")
                 encryptor_decryptor.decrypt_directory(input_dir, output_dir)
             elif choice == '5':
+                input_dir = input("Enter input directory path: ")
+                output_dir = input("Enter output directory path: ")
+                encryptor_decryptor.sync_directory(input_dir, output_dir)
+            elif choice == '6':
+                input_dir = input("Enter input directory path: ")
+                output_dir = input("Enter output directory path: ")
+                encryptor_decryptor.bundle_directory(input_dir, output_dir)
+            elif choice == '7':
+                input_dir = input("Enter bundle directory path: ")
+                output_dir = input("Enter output directory path: ")
+                encryptor_decryptor.unbundle_directory(input_dir, output_dir)
+            elif choice == '8':
                 print("Exiting...")
                 break
             else:
@@ -1,8 +1,51 @@
+import argparse
+import base64
+import collections
+import csv
 import hashlib
+import heapq
+import hmac
+import io
 import json
+import mmap
 import os
+import struct
 import sys
+import tempfile
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+HASH_LIST = [
+    'md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512',
+    'sha3_224', 'sha3_256', 'sha3_384', 'sha3_512'
+]
+DEFAULT_BATCH_SIZE = 10000  # Passwords per task in bulk mode
+SALT_SIZE = 16
+
+# Slow password hashing: PBKDF2 or scrypt, with parameters calibrated to a per-hash latency target and
+# stored in the encoded hash, e.g. $pbkdf2-sha256$600000$<salt>$<hash> or $scrypt$ln=15,r=8,p=1$<salt>$<hash>
+KDF_METHODS = ['pbkdf2-sha256', 'pbkdf2-sha512', 'scrypt']
+DEFAULT_TARGET_MS = 50.0
+DEFAULT_SCRYPT_MEMORY = 64 * 1024 * 1024  # Upper bound on the memory chosen for scrypt by calibration
+RECOMMENDED_PBKDF2_ITERATIONS = {'pbkdf2-sha256': 600000, 'pbkdf2-sha512': 210000}
+SCRYPT_KEY_SIZE = 32
+MAX_PBKDF2_ITERATIONS = 2 ** 31 - 1  # Largest iteration count hashlib.pbkdf2_hmac accepts
+MAX_SCRYPT_MEMORY = 1024 * 1024 * 1024  # Encoded scrypt hashes demanding more memory are rejected
+DEFAULT_KDF_BATCH_SIZE = 16  # Passwords per task for the slow hashes
+
+# Digest index: one file per algorithm holding fixed-width records (digest, offset of the password's line
+# in the password file) sorted by digest, followed by a fan-out table giving, for every two-byte digest
+# prefix, the number of records with a smaller prefix.
+INDEX_MAGIC = b'HWIX'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('>4sBBQ')  # Magic, version, digest size, record count
+INDEX_OFFSET = struct.Struct('>Q')
+INDEX_FANOUT = struct.Struct('>65537Q')
+INDEX_METADATA = 'index.json'
+PREFIX_READ_SIZE = 1024 * 1024  # Block size used to hash the indexed part of the password file
+INDEX_METADATA_KEYS = ('password_file', 'algorithms', 'processed_offset', 'prefix_digest')
+DEFAULT_RUN_SIZE = 1000000  # Records, across all algorithms, buffered before they are sorted into run files
+MERGE_READ_RECORDS = 4096  # Records read at a time from each run while merging
 
 
 # Custom Exception class for handling errors specific to HashingWizard
@@ -31,13 +74,10 @@ class ScreenManager:
 # Hashing Wizard Class to compute hash values for a given password
 class HashingWizard:
     def __init__(self, usr_pwd):
-        self.hash_list = [
-            'md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512',
-            'sha3_224', 'sha3_256', 'sha3_384', 'sha3_512'
-        ]
+        self.hash_list = list(HASH_LIST)
         self.hash_values = []  # List to store hash values
         self.usr_password = usr_pwd  # User-provided password
-        self.salt = os.urandom(16)  # Generate a random salt
+        self.salt = os.urandom(SALT_SIZE)  # Generate a random salt
 
     # Method to compute hash values without salt using various algorithms
     def compute_hashes_without_salt(self):
@@ -86,6 +126,278 @@ class HashingWizard:
 def key_formatter(value):
     return value.replace('_',' ').upper()
 
+def read_password_batches(stream, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Read passwords line by line from a binary stream, skipping empty lines.
+
+    :param stream: Binary file object, such as a file or sys.stdin.buffer.
+    :param batch_size: Number of passwords per batch.
+    :return: Generator of lists of passwords as bytes.
+    """
+    batch = []
+    for line in stream:
+        password = line.rstrip(b'\r\n')
+        if password:
+            batch.append(password)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def hash_password_batch(passwords, algorithms, salted=False, output_format='csv'):
+    """
+    Hash a batch of passwords and format the results; runs in the worker processes in bulk mode.
+
+    :param passwords: Passwords as bytes.
+    :param algorithms: Names of the algorithms from HASH_LIST to compute.
+    :param salted: If True, hash each password followed by its own random salt.
+    :param output_format: 'csv' or 'jsonl'.
+    :return: The formatted rows as a single string.
+    """
+    hash_functions = [getattr(hashlib, algorithm) for algorithm in algorithms]
+    keys = [key_formatter(algorithm) for algorithm in algorithms]
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n') if output_format == 'csv' else None
+    for password in passwords:
+        salt = os.urandom(SALT_SIZE) if salted else b''
+        salted_password = password + salt
+        hash_values = [hash_function(salted_password).hexdigest() for hash_function in hash_functions]
+        text = password.decode('utf-8', errors='replace')
+        if writer is not None:
+            writer.writerow([text] + hash_values + ([salt.hex()] if salted else []))
+        else:
+            record = {'Password': text, 'Hashes': dict(zip(keys, hash_values))}
+            if salted:
+                record['Salt'] = salt.hex()
+            output.write(json.dumps(record) + '\n')
+    return output.getvalue()
+
+def bulk_hash(stream, output, algorithms=None, salted=False, output_format='csv', workers=None,
+              batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Hash every password of a stream and write the results in input order.
+
+    Batches are hashed on a process pool. At most two batches per worker are in flight, so memory
+    stays bounded however long the input is.
+
+    :param stream: Binary stream of passwords, one per line.
+    :param output: Text stream the CSV or JSON Lines output is written to.
+    :return: Number of passwords hashed.
+    """
+    algorithms = algorithms or list(HASH_LIST)
+    unknown = [algorithm for algorithm in algorithms if algorithm not in HASH_LIST]
+    if unknown:
+        raise HashingWizardError(f"Unknown hash algorithm(s): {', '.join(unknown)}")
+    if output_format not in ('csv', 'jsonl'):
+        raise HashingWizardError('Invalid output format specified.')
+    workers = workers or os.cpu_count() or 1
+
+    if output_format == 'csv':
+        header = ['Password'] + [key_formatter(algorithm) for algorithm in algorithms] + (['Salt'] if salted else [])
+        csv.writer(output, lineterminator='\n').writerow(header)
+
+    count = 0
+
+    def tasks():
+        nonlocal count
+        for batch in read_password_batches(stream, batch_size):
+            count += len(batch)
+            yield batch, algorithms, salted, output_format
+
+    run_ordered(hash_password_batch, tasks(), output.write, workers)
+    return count
+
+def run_ordered(function, tasks, consume, workers=1):
+    """
+    Call function(*task) for every task on a process pool and pass the results to consume in task order.
+
+    At most two tasks per worker are in flight, so an unbounded stream of tasks uses bounded memory.
+    """
+    if workers == 1:
+        for task in tasks:
+            consume(function(*task))
+        return
+    pending = collections.deque()
+    pool = ProcessPoolExecutor(max_workers=workers)
+    finished = False
+    try:
+        for task in tasks:
+            if len(pending) >= 2 * workers:
+                consume(pending.popleft().result())
+            pending.append(pool.submit(function, *task))
+        while pending:
+            consume(pending.popleft().result())
+        finished = True
+    finally:
+        # When consume fails (such as on a closed pipe) the queued tasks are cancelled, not waited for
+        pool.shutdown(cancel_futures=not finished)
+
+def kdf_derive(password, kdf, params, salt):
+    """
+    Derive a slow hash of a password.
+
+    :param password: Password as bytes.
+    :param kdf: One of KDF_METHODS.
+    :param params: {'iterations': N} for PBKDF2, or {'n': N, 'r': R, 'p': P} for scrypt.
+    :param salt: Random salt as bytes.
+    :return: The derived key as bytes.
+    """
+    if kdf == 'scrypt':
+        n, r, p = params['n'], params['r'], params['p']
+        # maxmem must cover the 128 * r * (n + p) bytes scrypt allocates
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, dklen=SCRYPT_KEY_SIZE,
+                              maxmem=128 * r * (n + p) + 1024 * 1024)
+    if kdf in KDF_METHODS:
+        algorithm = kdf.split('-')[1]
+        return hashlib.pbkdf2_hmac(algorithm, password, salt, params['iterations'])
+    raise HashingWizardError(f"Unknown KDF '{kdf}'.")
+
+def check_kdf_params(kdf, params):
+    """
+    Make sure KDF parameters are usable before any hashing starts.
+
+    :param kdf: One of KDF_METHODS.
+    :param params: {'iterations': N} for PBKDF2, or {'n': N, 'r': R, 'p': P} for scrypt.
+    :raises HashingWizardError: If the KDF is unknown or a parameter is missing or out of range.
+    """
+    if kdf not in KDF_METHODS:
+        raise HashingWizardError(f"Unknown KDF '{kdf}'.")
+    try:
+        if kdf == 'scrypt':
+            n, r, p = (int(params[name]) for name in ('n', 'r', 'p'))
+            if n < 2 or n & (n - 1):
+                raise HashingWizardError(f"scrypt n must be a power of two greater than 1, not {n}.")
+            if r < 1 or p < 1 or r * p >= 1 << 30:
+                raise HashingWizardError(f"scrypt r and p must be positive with r * p < 2^30, not r={r}, p={p}.")
+            if 128 * r * (n + p) > MAX_SCRYPT_MEMORY:
+                raise HashingWizardError(f"scrypt parameters n={n}, r={r}, p={p} need more than "
+                                         f"{MAX_SCRYPT_MEMORY // (1024 * 1024)} MiB of memory.")
+        else:
+            iterations = int(params['iterations'])
+            if not 1 <= iterations <= MAX_PBKDF2_ITERATIONS:
+                raise HashingWizardError(f"PBKDF2 iterations must be between 1 and {MAX_PBKDF2_ITERATIONS}, "
+                                         f"not {iterations}.")
+    except (KeyError, TypeError, ValueError) as e:
+        raise HashingWizardError(f"Invalid {kdf} parameters {params}: {e}")
+
+def encode_kdf_hash(kdf, params, salt, derived):
+    def b64(value):
+        return base64.b64encode(value).decode().rstrip('=')
+    if kdf == 'scrypt':
+        settings = f"ln={params['n'].bit_length() - 1},r={params['r']},p={params['p']}"
+    else:
+        settings = str(params['iterations'])
+    return f"${kdf}${settings}${b64(salt)}${b64(derived)}"
+
+def decode_kdf_hash(encoded):
+    """
+    :return: Tuple of (kdf, params, salt, derived key) of an encoded slow hash.
+    """
+    def unb64(value):
+        return base64.b64decode(value + '=' * (-len(value) % 4))
+    try:
+        _, kdf, settings, salt, derived = encoded.strip().split('$')
+        if kdf not in KDF_METHODS:
+            raise ValueError(f"unknown KDF '{kdf}'")
+        if kdf == 'scrypt':
+            fields = dict(field.split('=') for field in settings.split(','))
+            log_n = int(fields['ln'])
+            if not 1 <= log_n < 64:
+                raise ValueError(f"ln={log_n} is out of range")
+            params = {'n': 1 << log_n, 'r': int(fields['r']), 'p': int(fields['p'])}
+        else:
+            params = {'iterations': int(settings)}
+        check_kdf_params(kdf, params)
+        return kdf, params, unb64(salt), unb64(derived)
+    except (ValueError, KeyError) as e:
+        raise HashingWizardError(f"Invalid encoded hash '{encoded.strip()}': {e}")
+    except HashingWizardError as e:
+        raise HashingWizardError(f"Invalid encoded hash '{encoded.strip()}': {e.message}")
+
+def kdf_hash_batch(passwords, kdf, params, output_format='csv'):
+    # Runs in the worker processes: hash each password with its own salt and format the rows
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n') if output_format == 'csv' else None
+    for password in passwords:
+        salt = os.urandom(SALT_SIZE)
+        encoded = encode_kdf_hash(kdf, params, salt, kdf_derive(password, kdf, params, salt))
+        text = password.decode('utf-8', errors='replace')
+        if writer is not None:
+            writer.writerow([text, encoded])
+        else:
+            output.write(json.dumps({'Password': text, 'Hash': encoded}) + '\n')
+    return output.getvalue()
+
+def verify_kdf_batch(pairs):
+    # Runs in the worker processes: check (encoded hash, password) pairs. Each result is True or False,
+    # or an error message when the encoded hash cannot be used, so one bad line does not stop the batch.
+    results = []
+    for encoded, password in pairs:
+        try:
+            kdf, params, salt, derived = decode_kdf_hash(encoded)
+            results.append(hmac.compare_digest(kdf_derive(password, kdf, params, salt), derived))
+        except HashingWizardError as e:
+            results.append(e.message)
+        except (ValueError, OverflowError, MemoryError) as e:
+            results.append(f"Cannot verify encoded hash '{encoded.strip()}': {e}")
+    return results
+
+def time_kdf(kdf, params, repeat=3):
+    # Median latency of one hash in milliseconds
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        kdf_derive(b'calibration password', kdf, params, b'\0' * SALT_SIZE)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+def calibrate_kdf(kdf, target_ms=DEFAULT_TARGET_MS, max_memory=DEFAULT_SCRYPT_MEMORY):
+    """
+    Benchmark this host and choose KDF parameters that take about target_ms per hash.
+
+    PBKDF2 iterations scale linearly with time. For scrypt, the memory cost n is doubled while that
+    brings the latency closer to the target and stays within max_memory, and the parallelism p then
+    makes up any remaining time.
+
+    :return: Dictionary with the KDF, its parameters, the target and the measured latency.
+    """
+    if target_ms <= 0:
+        raise HashingWizardError('Target latency must be positive.')
+    if kdf == 'scrypt':
+        params = {'n': 1 << 10, 'r': 8, 'p': 1}
+        elapsed = time_kdf(kdf, params)
+        while elapsed * 3 < target_ms * 2 and 128 * params['r'] * params['n'] * 2 <= max_memory:
+            params['n'] *= 2
+            elapsed = time_kdf(kdf, params)
+        params['p'] = max(1, round(target_ms / elapsed))
+    elif kdf in KDF_METHODS:
+        params = {'iterations': 10000}
+        elapsed = time_kdf(kdf, params)
+        while elapsed < 20:  # Measure long enough for a stable rate
+            params['iterations'] *= 4
+            elapsed = time_kdf(kdf, params)
+        iterations = int(params['iterations'] * target_ms / elapsed)
+        params['iterations'] = max(1000, iterations // 1000 * 1000)
+    else:
+        raise HashingWizardError(f"Unknown KDF '{kdf}'.")
+    return {'kdf': kdf, 'params': params, 'target_ms': target_ms, 'measured_ms': round(time_kdf(kdf, params), 2)}
+
+def read_verify_pairs(stream, batch_size):
+    # Lines of '<encoded hash> <TAB> <password>'; the encoded hash never contains a tab
+    batch = []
+    for line in stream:
+        line = line.rstrip(b'\r\n')
+        if not line:
+            continue
+        encoded, _, password = line.partition(b'\t')
+        batch.append((encoded.decode('ascii', errors='replace'), password))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 def hashing_wizard_controller(user_password):
     try:
         # Create an instance of HashingWizard with user-provided password
@@ -159,7 +471,506 @@ def user_interactive_phrase():
         sys.exit(1)  # Exit the script with an error status code
 
 
+class DigestIndex:
+    """
+    On-disk index from unsalted digests back to the passwords of a password file.
+
+    Index files are memory-mapped and searched with a binary search inside the fan-out bucket of the
+    digest, so lookups do not load the index into memory. Builds are incremental: passwords appended
+    to the password file since the last build are sorted in runs and merged into the existing index.
+    """
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.metadata = self._load_metadata()
+        self._open_indexes = {}  # Algorithm -> (file, mmap, digest size, record count, fan-out table)
+        self._password_file = None
+
+    def build(self, password_path, algorithms=None, run_size=DEFAULT_RUN_SIZE):
+        """
+        Index the passwords added to a password file since the last build, or all of them when the
+        password file or the algorithms changed. Only complete (newline-terminated) lines are indexed.
+
+        :param password_path: Password file, one password per line.
+        :param algorithms: Algorithms to index (default: as before, or all).
+        :param run_size: Records, counted across all algorithms, held in memory before they are sorted and
+                         spilled to run files.
+        :return: Number of passwords indexed by this build.
+        """
+        self.close()
+        password_path = os.path.abspath(password_path)
+        algorithms = algorithms or (self.metadata or {}).get('algorithms') or list(HASH_LIST)
+        unknown = [algorithm for algorithm in algorithms if algorithm not in HASH_LIST]
+        if unknown:
+            raise HashingWizardError(f"Unknown hash algorithm(s): {', '.join(unknown)}")
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        start, prefix_hash = 0, hashlib.sha256()  # Hash of every byte indexed so far
+        if (self.metadata and self.metadata['password_file'] == password_path
+                and self.metadata['algorithms'] == algorithms and self._indexes_complete()):
+            resumed = self._hash_prefix(password_path, self.metadata['processed_offset'])
+            if resumed.hexdigest() == self.metadata['prefix_digest']:
+                start, prefix_hash = self.metadata['processed_offset'], resumed
+
+        if run_size < 1:
+            raise HashingWizardError("The run size must be at least 1.")
+        hash_functions = [(algorithm, getattr(hashlib, algorithm)) for algorithm in algorithms]
+        run_passwords = max(1, run_size // len(algorithms))  # Every password adds one record per algorithm
+        pending = {algorithm: bytearray() for algorithm in algorithms}  # Packed fixed-width records
+        runs = {algorithm: [] for algorithm in algorithms}
+        count, offset = 0, start
+        try:
+            with open(password_path, 'rb') as passwords:
+                passwords.seek(start)
+                for line in passwords:
+                    if not line.endswith(b'\n'):
+                        break  # May still be growing; indexed once it is terminated
+                    prefix_hash.update(line)
+                    password = line.rstrip(b'\r\n')
+                    if password:
+                        packed_offset = INDEX_OFFSET.pack(offset)
+                        for algorithm, hash_function in hash_functions:
+                            records = pending[algorithm]
+                            records += hash_function(password).digest()
+                            records += packed_offset
+                        count += 1
+                        if count % run_passwords == 0:
+                            self._spill_runs(pending, runs)
+                    offset += len(line)
+            self._spill_runs(pending, runs)
+
+            record_counts = {}
+            for algorithm, hash_function in hash_functions:
+                existing = self._index_path(algorithm) if start else None
+                record_counts[algorithm] = self._merge_runs(algorithm, hash_function().digest_size,
+                                                            runs[algorithm], existing)
+        finally:
+            for run_paths in runs.values():
+                for run_path in run_paths:
+                    os.remove(run_path)
+
+        # Every index is complete before any is replaced. The metadata goes last and records the count of
+        # each index, so a build interrupted between the renames is detected and redone from the start
+        metadata = {
+            'version': INDEX_VERSION,
+            'password_file': password_path,
+            'algorithms': algorithms,
+            'processed_offset': offset,
+            'prefix_digest': prefix_hash.hexdigest(),
+            'record_counts': record_counts,
+        }
+        metadata_path = os.path.join(self.index_dir, INDEX_METADATA)
+        with open(metadata_path + '.tmp', 'w', encoding='utf-8') as metadata_file:
+            json.dump(metadata, metadata_file, indent=4)
+        for algorithm in algorithms:
+            os.replace(self._index_path(algorithm) + '.tmp', self._index_path(algorithm))
+        os.replace(metadata_path + '.tmp', metadata_path)
+        self.metadata = metadata
+        return count
+
+    def lookup(self, digest, algorithms=None):
+        """
+        Find the passwords whose digest matches.
+
+        :param digest: Digest as bytes or a hexadecimal string.
+        :param algorithms: Algorithms to search (default: every indexed algorithm of the digest's size).
+        :return: List of (algorithm, password bytes) pairs.
+        """
+        if self.metadata is None:
+            raise HashingWizardError(f"No digest index found in '{self.index_dir}'.")
+        if isinstance(digest, str):
+            try:
+                digest = bytes.fromhex(digest.strip())
+            except ValueError:
+                raise HashingWizardError(f"Invalid digest '{digest.strip()}'.")
+        matches = []
+        for algorithm in algorithms or self.metadata['algorithms']:
+            index_map, digest_size, record_count, fanout = self._open_index(algorithm)
+            if len(digest) != digest_size:
+                continue
+            for offset in self._search(index_map, digest_size, record_count, fanout, digest):
+                password = self._read_password(offset)
+                if getattr(hashlib, algorithm)(password).digest() == digest:  # Password file may have changed
+                    matches.append((algorithm, password))
+        return matches
+
+    def close(self):
+        for index_file, index_map, _, _, _ in self._open_indexes.values():
+            index_map.close()
+            index_file.close()
+        self._open_indexes.clear()
+        if self._password_file is not None:
+            self._password_file.close()
+            self._password_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _index_path(self, algorithm):
+        return os.path.join(self.index_dir, f'{algorithm}.idx')
+
+    def _load_metadata(self):
+        metadata_path = os.path.join(self.index_dir, INDEX_METADATA)
+        if not os.path.exists(metadata_path):
+            return None
+        with open(metadata_path, 'r', encoding='utf-8') as metadata_file:
+            try:
+                metadata = json.load(metadata_file)
+            except ValueError as e:
+                raise HashingWizardError(f"Cannot read digest index metadata '{metadata_path}': {e}")
+        if not isinstance(metadata, dict):
+            raise HashingWizardError(f"'{metadata_path}' does not hold digest index metadata.")
+        if metadata.get('version') != INDEX_VERSION:
+            raise HashingWizardError(f"Unsupported digest index version {metadata.get('version')}.")
+        missing = [key for key in INDEX_METADATA_KEYS if key not in metadata]
+        if missing or not isinstance(metadata['algorithms'], list) or not isinstance(metadata['processed_offset'], int):
+            raise HashingWizardError(f"Digest index metadata '{metadata_path}' is incomplete or damaged.")
+        return metadata
+
+    def _hash_prefix(self, password_path, offset):
+        # SHA-256 of the first offset bytes of the password file, to be continued over the new lines
+        prefix_hash = hashlib.sha256()
+        with open(password_path, 'rb') as passwords:
+            while offset > 0:
+                block = passwords.read(min(offset, PREFIX_READ_SIZE))
+                if not block:
+                    return hashlib.sha256(b'truncated')  # Shorter than the indexed part: cannot match
+                prefix_hash.update(block)
+                offset -= len(block)
+        return prefix_hash
+
+    def _indexes_complete(self):
+        # Whether every index holds the record count the metadata expects; an index replaced by a build
+        # that stopped before writing its metadata already holds records past processed_offset
+        record_counts = self.metadata.get('record_counts')
+        if not isinstance(record_counts, dict):
+            return False  # Written by an older version
+        for algorithm in self.metadata['algorithms']:
+            try:
+                with open(self._index_path(algorithm), 'rb') as index_file:
+                    header = index_file.read(INDEX_HEADER.size)
+            except FileNotFoundError:
+                return False
+            if len(header) != INDEX_HEADER.size or INDEX_HEADER.unpack(header)[3] != record_counts.get(algorithm):
+                return False
+        return True
+
+    def _spill_runs(self, pending, runs):
+        # Sort the pending records of every algorithm and write them to temporary run files; records are
+        # split into separate objects for sorting one algorithm at a time
+        for algorithm, buffer in pending.items():
+            if not buffer:
+                continue
+            record_size = getattr(hashlib, algorithm)().digest_size + INDEX_OFFSET.size
+            data = bytes(buffer)
+            buffer.clear()
+            records = sorted(data[position:position + record_size] for position in range(0, len(data), record_size))
+            del data
+            run_file, run_path = tempfile.mkstemp(prefix=f'{algorithm}-', suffix='.run', dir=self.index_dir)
+            with os.fdopen(run_file, 'wb') as run:
+                run.write(b''.join(records))
+            runs[algorithm].append(run_path)
+
+    def _merge_runs(self, algorithm, digest_size, run_paths, existing=None):
+        record_size = digest_size + INDEX_OFFSET.size
+        sources = [read_records(run_path, record_size) for run_path in run_paths]
+        if existing is not None and os.path.exists(existing):
+            with open(existing, 'rb') as index_file:
+                _, _, _, existing_count = INDEX_HEADER.unpack(index_file.read(INDEX_HEADER.size))
+            sources.append(read_records(existing, record_size, INDEX_HEADER.size, existing_count))
+
+        index_path = self._index_path(algorithm)
+        counts = [0] * 65536
+        record_count = 0
+        with open(index_path + '.tmp', 'wb') as index_file:
+            index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, digest_size, 0))
+            block = []
+            for record in heapq.merge(*sources):
+                counts[(record[0] << 8) | record[1]] += 1
+                block.append(record)
+                if len(block) == MERGE_READ_RECORDS:
+                    index_file.write(b''.join(block))
+                    block.clear()
+            index_file.write(b''.join(block))
+            record_count = sum(counts)
+            fanout, total = [0], 0
+            for prefix_count in counts:
+                total += prefix_count
+                fanout.append(total)
+            index_file.write(INDEX_FANOUT.pack(*fanout))
+            index_file.seek(0)
+            index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, digest_size, record_count))
+        return record_count
+
+    def _open_index(self, algorithm):
+        if algorithm not in self._open_indexes:
+            if algorithm not in self.metadata['algorithms']:
+                raise HashingWizardError(f"Algorithm '{algorithm}' is not indexed.")
+            index_file = open(self._index_path(algorithm), 'rb')
+            index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, digest_size, record_count = INDEX_HEADER.unpack_from(index_map)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise HashingWizardError(f"'{self._index_path(algorithm)}' is not a digest index.")
+            fanout_offset = INDEX_HEADER.size + record_count * (digest_size + INDEX_OFFSET.size)
+            fanout = INDEX_FANOUT.unpack_from(index_map, fanout_offset)
+            self._open_indexes[algorithm] = (index_file, index_map, digest_size, record_count, fanout)
+        return self._open_indexes[algorithm][1:]
+
+    def _search(self, index_map, digest_size, record_count, fanout, digest):
+        # Binary search for the first record of the digest within its fan-out bucket
+        record_size = digest_size + INDEX_OFFSET.size
+        prefix = (digest[0] << 8) | digest[1]
+        low, high = fanout[prefix], fanout[prefix + 1]
+        while low < high:
+            middle = (low + high) // 2
+            position = INDEX_HEADER.size + middle * record_size
+            if index_map[position:position + digest_size] < digest:
+                low = middle + 1
+            else:
+                high = middle
+        offsets = []
+        position = INDEX_HEADER.size + low * record_size
+        while low < record_count and index_map[position:position + digest_size] == digest:
+            offsets.append(INDEX_OFFSET.unpack_from(index_map, position + digest_size)[0])
+            low += 1
+            position += record_size
+        return offsets
+
+    def _read_password(self, offset):
+        if self._password_file is None:
+            self._password_file = open(self.metadata['password_file'], 'rb')
+        self._password_file.seek(offset)
+        return self._password_file.readline().rstrip(b'\r\n')
+
+def read_records(path, record_size, start=0, count=None):
+    """
+    Yield the fixed-width records of a sorted run or index file, reading them in blocks.
+    """
+    with open(path, 'rb') as records_file:
+        records_file.seek(start)
+        remaining = count
+        while remaining is None or remaining > 0:
+            block_records = MERGE_READ_RECORDS if remaining is None else min(MERGE_READ_RECORDS, remaining)
+            block = records_file.read(block_records * record_size)
+            if not block:
+                return
+            for position in range(0, len(block), record_size):
+                yield block[position:position + record_size]
+            if remaining is not None:
+                remaining -= len(block) // record_size
+
+def parse_algorithms(value):
+    return [algorithm.strip().lower() for algorithm in value.split(',') if algorithm.strip()]
+
+def parse_arguments(argv):
+    """
+    Parse the command-line arguments of the non-interactive modes.
+
+    :param argv: Arguments without the program name.
+    :return: argparse.Namespace with the selected command and its options.
+    """
+    parser = argparse.ArgumentParser(usage="python HashingWizard.py <command> [options]")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    bulk = commands.add_parser('bulk', help="hash a list of passwords, one per line")
+    bulk.add_argument('input', nargs='?', default='-', help="password file (default: standard input)")
+    bulk.add_argument('--algo', type=parse_algorithms, default=None,
+                      help="comma-separated algorithms to compute (default: all)")
+    bulk.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help="output format (default: csv)")
+    bulk.add_argument('--salt', action='store_true', help="hash each password with its own random salt")
+    bulk.add_argument('--output', help="file the results are written to (default: standard output)")
+    bulk.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    bulk.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                      help=f"passwords per task (default: {DEFAULT_BATCH_SIZE})")
+
+    index = commands.add_parser('index', help="build or update a digest index of a password file")
+    index.add_argument('input', help="password file, one password per line")
+    index.add_argument('--index-dir', required=True, help="directory holding the index")
+    index.add_argument('--algo', type=parse_algorithms, default=None,
+                       help="comma-separated algorithms to index (default: as before, or all)")
+    index.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE,
+                       help=f"records sorted in memory per run, across all algorithms (default: {DEFAULT_RUN_SIZE})")
+
+    lookup = commands.add_parser('lookup', help="find the passwords of unsalted digests in a digest index")
+    lookup.add_argument('digests', nargs='*', help="hexadecimal digests to look up")
+    lookup.add_argument('--index-dir', required=True, help="directory holding the index")
+    lookup.add_argument('--digests-file', help="file of digests, one per line ('-' for standard input)")
+    lookup.add_argument('--algo', type=parse_algorithms, default=None,
+                        help="comma-separated algorithms to search (default: all of the digest's size)")
+
+    calibrate = commands.add_parser('calibrate', help="choose KDF parameters for a target latency per hash")
+    calibrate.add_argument('--kdf', choices=KDF_METHODS, default='pbkdf2-sha256', help="(default: pbkdf2-sha256)")
+    calibrate.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS,
+                           help=f"target milliseconds per hash (default: {DEFAULT_TARGET_MS:g})")
+    calibrate.add_argument('--max-memory', type=int, default=DEFAULT_SCRYPT_MEMORY // (1024 * 1024),
+                           help="largest scrypt memory cost in MiB (default: 64)")
+    calibrate.add_argument('--save', help="file the chosen parameters are written to as JSON")
+
+    kdf = commands.add_parser('kdf', help="hash a list of passwords with PBKDF2 or scrypt")
+    kdf.add_argument('input', nargs='?', default='-', help="password file (default: standard input)")
+    kdf.add_argument('--kdf', choices=KDF_METHODS, default='pbkdf2-sha256', help="(default: pbkdf2-sha256)")
+    kdf.add_argument('--params', help="parameters saved by 'calibrate --save' (default: calibrate now)")
+    kdf.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS,
+                     help=f"target milliseconds per hash when calibrating (default: {DEFAULT_TARGET_MS:g})")
+    kdf.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help="output format (default: csv)")
+    kdf.add_argument('--output', help="file the results are written to (default: standard output)")
+    kdf.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+
+    verify = commands.add_parser('verify', help="check passwords against encoded PBKDF2 or scrypt hashes")
+    verify.add_argument('input', nargs='?', default='-',
+                        help="file of '<encoded hash><TAB><password>' lines (default: standard input)")
+    verify.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    return parser.parse_args(argv)
+
+def run_calibrate_mode(args):
+    calibration = calibrate_kdf(args.kdf, args.target_ms, args.max_memory * 1024 * 1024)
+    document = json.dumps(calibration, indent=4)
+    print(document)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as params_file:
+            params_file.write(document + '\n')
+    recommended = RECOMMENDED_PBKDF2_ITERATIONS.get(args.kdf)
+    if recommended and calibration['params']['iterations'] < recommended:
+        print(f"Warning: fewer than the recommended {recommended} iterations; consider a higher target.",
+              file=sys.stderr)
+
+def run_kdf_mode(args):
+    if args.workers is not None and args.workers < 1:
+        raise HashingWizardError('Number of workers must be at least 1.')
+    if args.params:
+        with open(args.params, 'r', encoding='utf-8') as params_file:
+            try:
+                calibration = json.load(params_file)
+            except ValueError as e:
+                raise HashingWizardError(f"Cannot read parameters from '{args.params}': {e}")
+        if not isinstance(calibration, dict):
+            raise HashingWizardError(f"'{args.params}' does not hold saved KDF parameters.")
+    else:
+        calibration = calibrate_kdf(args.kdf, args.target_ms)
+    kdf, params = calibration.get('kdf'), calibration.get('params')
+    check_kdf_params(kdf, params)
+    print(f"Using {kdf} with {params} (about {calibration.get('measured_ms', '?')} ms per hash).", file=sys.stderr)
+
+    stream = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    count = 0
+
+    def tasks():
+        nonlocal count
+        for batch in read_password_batches(stream, DEFAULT_KDF_BATCH_SIZE):
+            count += len(batch)
+            yield batch, kdf, params, args.format
+
+    try:
+        if args.format == 'csv':
+            csv.writer(output, lineterminator='\n').writerow(['Password', 'Hash'])
+        run_ordered(kdf_hash_batch, tasks(), output.write, args.workers or os.cpu_count() or 1)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+        if output is not sys.stdout:
+            output.close()
+    print(f'{count} password(s) hashed.', file=sys.stderr)
+
+def run_verify_mode(args):
+    if args.workers is not None and args.workers < 1:
+        raise HashingWizardError('Number of workers must be at least 1.')
+    stream = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    line_number, failed = 0, 0
+
+    def report(results):
+        nonlocal line_number, failed
+        for matched in results:
+            line_number += 1
+            if matched is not True:
+                failed += 1
+                print(f"Line {line_number}: {matched or 'password does not match.'}")
+
+    try:
+        batches = ((batch,) for batch in read_verify_pairs(stream, DEFAULT_KDF_BATCH_SIZE))
+        run_ordered(verify_kdf_batch, batches, report, args.workers or os.cpu_count() or 1)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    print(f"{line_number - failed} of {line_number} password(s) verified.", file=sys.stderr)
+    if failed:
+        sys.exit(1)  # Exit the script with an error status code
+
+def run_index_mode(args):
+    with DigestIndex(args.index_dir) as digest_index:
+        start = time.perf_counter()
+        count = digest_index.build(args.input, args.algo, args.run_size)
+        elapsed = time.perf_counter() - start
+    print(f"{count} password(s) indexed in {elapsed:.1f}s.", file=sys.stderr)
+
+def run_lookup_mode(args):
+    digests = list(args.digests)
+    if args.digests_file:
+        stream = sys.stdin if args.digests_file == '-' else open(args.digests_file, 'r', encoding='utf-8')
+        with stream:
+            digests.extend(line.strip() for line in stream if line.strip())
+    found = 0
+    with DigestIndex(args.index_dir) as digest_index:
+        for digest in digests:
+            matches = digest_index.lookup(digest, args.algo)
+            for algorithm, password in matches:
+                print(f"{digest.lower()} {key_formatter(algorithm)}: {password.decode('utf-8', errors='replace')}")
+            if not matches:
+                print(f"{digest.lower()}: not found")
+            found += bool(matches)
+    print(f"{found} of {len(digests)} digest(s) found.", file=sys.stderr)
+
+def run_bulk_mode(args):
+    if (args.workers is not None and args.workers < 1) or args.batch_size < 1:
+        raise HashingWizardError('Number of workers and batch size must be at least 1.')
+    stream = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        count = bulk_hash(stream, output, args.algo, args.salt, args.format, args.workers, args.batch_size)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+        if output is not sys.stdout:
+            output.close()
+    print(f'{count} password(s) hashed.', file=sys.stderr)
+
+def command_line_mode(argv):
+    try:
+        args = parse_arguments(argv)
+        if args.command == 'bulk':
+            run_bulk_mode(args)
+        elif args.command == 'index':
+            run_index_mode(args)
+        elif args.command == 'lookup':
+            run_lookup_mode(args)
+        elif args.command == 'calibrate':
+            run_calibrate_mode(args)
+        elif args.command == 'kdf':
+            run_kdf_mode(args)
+        elif args.command == 'verify':
+            run_verify_mode(args)
+    except KeyboardInterrupt:
+        print("Process interrupted by the user.")
+        sys.exit(1)  # Exit the script with an error status code
+    except HashingWizardError as hwe:
+        print(f'Error processing passwords: {hwe.message}')
+        sys.exit(1)  # Exit the script with an error status code
+    except BrokenPipeError:
+        # The reader went away (as with '| head'); point stdout at devnull so the final flush stays quiet
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)  # Exit the script with an error status code
+    except OSError as e:
+        print(f'Error accessing file: {e}')
+        sys.exit(1)  # Exit the script with an error status code
+
+
 # Entry point of the script
 if __name__ == "__main__":
-    user_interactive_phrase()  # Call the function to start interactive hashing
+    if len(sys.argv) > 1:
+        command_line_mode(sys.argv[1:])  # Non-interactive modes, such as bulk hashing
+    else:
+        user_interactive_phrase()  # Call the function to start interactive hashing
     sys.exit(0)  # Exit the script with a success status code
@@ -1,3 +1,7 @@
+import argparse
+import bisect
+import itertools
+import math
 import string
 import secrets
 import random
@@ -5,6 +9,20 @@ import os
 import time
 import sys
 
+try:
+    import numpy as np  # Optional: vectorizes the rejection sampling of bulk generation
+except ImportError:
+    np = None
+
+ENTROPY_BLOCK_SIZE = 64 * 1024  # Bytes requested from os.urandom per refill
+DEFAULT_GENERATE_BATCH = 4096  # Passwords produced per batch by bulk generation
+PASSWORD_POLICIES = ['normal', 'secure']
+SECURE_MIN_DIGITS = 5  # A secure password contains at least this many digits ...
+SECURE_MIN_SPECIAL = 1  # ... and at least this many special characters
+AMBIGUOUS_CHARS = 'Il1|O0o'  # Characters that are easily mistaken for one another
+POLICY_CACHE_LENGTHS = 16  # Password lengths whose sampling tables a PasswordPolicy keeps
+REJECTION_MIN_ACCEPTANCE = 0.5  # Draw whole passwords when at least this share is expected to pass
+
 # Custom Exception Classes
 class PasswordGeneratorError(Exception):
     """Base class for exceptions in this module."""
@@ -30,6 +48,12 @@ class PasswordCategoryError(PasswordGeneratorError):
         self.message = message
         super().__init__(self.message)
 
+class PasswordPolicyError(PasswordGeneratorError):
+    """Exception raised for a password policy that cannot be satisfied."""
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
 class ScreenManager:
     def __init__(self):
         """Initialize ScreenManager with the command to clear the screen."""
@@ -50,18 +74,312 @@ class ScreenManager:
 class CharacterLake:
     def __init__(self):
         """Initialize CharacterLake with character sets for password generation."""
+        self.lowercase = string.ascii_lowercase
+        self.uppercase = string.ascii_uppercase
         self.letters = string.ascii_letters
         self.digits = string.digits
         self.special_chars = string.punctuation
+        self.characters = self.letters + self.digits + self.special_chars
 
     def get_characters(self):
         """Return a string of all characters for password generation."""
-        return self.letters + self.digits + self.special_chars
+        return self.characters
+
+class EntropyPool:
+    def __init__(self, alphabet, block_size=ENTROPY_BLOCK_SIZE):
+        """
+        Draw characters uniformly from an alphabet using buffered os.urandom output.
+
+        Each random byte below the largest multiple of the alphabet size that fits in a byte
+        selects one character; the remaining byte values are rejected, so there is no modulo bias.
+
+        :param alphabet: Characters to draw from (at most 256, each a Latin-1 character).
+        :param block_size: Number of bytes requested from os.urandom at a time.
+        :raises InvalidInputError: If the alphabet is empty, too large or not Latin-1.
+        """
+        alphabet = ''.join(dict.fromkeys(alphabet))  # Repeated characters would be drawn more often
+        if not 0 < len(alphabet) <= 256:
+            raise InvalidInputError("The alphabet must contain between 1 and 256 distinct characters.")
+        try:
+            encoded = alphabet.encode('latin-1')
+        except UnicodeEncodeError:
+            raise InvalidInputError("The alphabet may only contain Latin-1 characters.")
+
+        self.alphabet = alphabet
+        self.block_size = block_size
+        self.limit = 256 - 256 % len(alphabet)  # Byte values from limit upwards are rejected
+        # Byte value b maps to alphabet[b % len(alphabet)] for every accepted b
+        table = encoded * (self.limit // len(alphabet))
+        if np is not None:
+            self._table = np.frombuffer(table.ljust(256, b'\0'), dtype=np.uint8)
+        else:
+            self._table = table.ljust(256, b'\0')
+            self._rejected = bytes(range(self.limit, 256))
+        self._buffer = ''  # Accepted characters; those before _offset have been handed out
+        self._offset = 0
+
+    def read(self, count):
+        """
+        Return a string of count characters drawn uniformly and independently from the alphabet.
+
+        :param count: Number of characters to draw.
+        :return: The characters as a string.
+        """
+        end = self._offset + count
+        if end <= len(self._buffer):
+            text = self._buffer[self._offset:end]
+            self._offset = end
+            return text
+
+        # Refill: the unused tail is carried over, so the buffer is only copied once per block
+        parts = [self._buffer[self._offset:]]
+        available = len(parts[0])
+        while available < count:
+            # Ask for enough bytes to cover the expected rejections in a single refill
+            needed = (count - available) * 256 // self.limit + 64
+            chunk = self._draw(max(self.block_size, needed))
+            parts.append(chunk)
+            available += len(chunk)
+        self._buffer = ''.join(parts)
+        self._offset = count
+        return self._buffer[:count]
+
+    def _draw(self, size):
+        # Map one block of random bytes onto the alphabet, dropping the rejected bytes
+        data = os.urandom(size)
+        if np is not None:
+            values = np.frombuffer(data, dtype=np.uint8)
+            return self._table[values[values < self.limit]].tobytes().decode('latin-1')
+        return data.translate(self._table, self._rejected).decode('latin-1')
+
+class RandomIndexSource:
+    def __init__(self, block_size=ENTROPY_BLOCK_SIZE):
+        """
+        Draw uniform random integers from buffered os.urandom output, for shuffles and other index choices.
+
+        :param block_size: Number of bytes requested from os.urandom at a time.
+        """
+        self.block_size = block_size
+        self._buffer = b''
+        self._offset = 0
+
+    def below(self, bound):
+        """
+        Return a uniform random integer in [0, bound), rejecting values that would bias the result.
+
+        :param bound: Exclusive upper bound; must be positive.
+        :return: The random integer.
+        """
+        if bound <= 256:  # One byte per attempt, as in EntropyPool
+            limit = 256 - 256 % bound
+            while True:
+                if self._offset >= len(self._buffer):
+                    self._refill(1)
+                value = self._buffer[self._offset]
+                self._offset += 1
+                if value < limit:
+                    return value % bound
+
+        size = ((bound - 1).bit_length() + 7) // 8
+        span = 1 << (8 * size)
+        limit = span - span % bound
+        while True:
+            if self._offset + size > len(self._buffer):
+                self._refill(size)
+            value = int.from_bytes(self._buffer[self._offset:self._offset + size], 'big')
+            self._offset += size
+            if value < limit:
+                return value % bound
+
+    def shuffle(self, items):
+        """
+        Shuffle a list in place with the Fisher-Yates algorithm, so every order is equally likely.
+
+        :param items: The list to shuffle.
+        """
+        for position in range(len(items) - 1, 0, -1):
+            other = self.below(position + 1)
+            items[position], items[other] = items[other], items[position]
+
+    def _refill(self, size):
+        # Unused bytes left in the buffer are dropped; every byte is independent, so this adds no bias
+        self._buffer = os.urandom(max(self.block_size, size))
+        self._offset = 0
+
+class PasswordPolicy:
+    def __init__(self, min_lower=0, min_upper=0, min_digits=0, min_special=0, lower=None, upper=None,
+                 digits=None, special=None, exclude='', exclude_ambiguous=False):
+        """
+        Describe which passwords are acceptable: allowed characters and minimum counts per character class.
+
+        :param min_lower: Minimum number of lowercase letters.
+        :param min_upper: Minimum number of uppercase letters.
+        :param min_digits: Minimum number of digits.
+        :param min_special: Minimum number of special characters.
+        :param lower: Allowed lowercase letters (default: CharacterLake; an empty string disables the class).
+        :param upper: Allowed uppercase letters (default: CharacterLake; an empty string disables the class).
+        :param digits: Allowed digits (default: CharacterLake; an empty string disables the class).
+        :param special: Allowed special characters (default: CharacterLake; an empty string disables the class).
+        :param exclude: Characters that must not appear in any class.
+        :param exclude_ambiguous: If True, also exclude AMBIGUOUS_CHARS.
+        :raises PasswordPolicyError: If a minimum is negative, a required class has no characters left,
+                                     or two classes share a character.
+        """
+        character_lake = CharacterLake()
+        excluded = set(exclude) | (set(AMBIGUOUS_CHARS) if exclude_ambiguous else set())
+        candidates = [
+            ('lowercase', character_lake.lowercase if lower is None else lower, min_lower),
+            ('uppercase', character_lake.uppercase if upper is None else upper, min_upper),
+            ('digits', character_lake.digits if digits is None else digits, min_digits),
+            ('special', character_lake.special_chars if special is None else special, min_special),
+        ]
+
+        self.classes = []  # (name, characters, minimum) of every class that can be used
+        seen = set()
+        for name, characters, minimum in candidates:
+            characters = ''.join(char for char in dict.fromkeys(characters) if char not in excluded)
+            if minimum < 0:
+                raise PasswordPolicyError(f"The minimum number of {name} must not be negative.")
+            if not characters:
+                if minimum > 0:
+                    raise PasswordPolicyError(f"At least {minimum} {name} required, but no {name} are allowed.")
+                continue
+            if seen.intersection(characters):
+                raise PasswordPolicyError(f"The {name} share characters with another character class.")
+            seen.update(characters)
+            self.classes.append((name, characters, minimum))
+        if not self.classes:
+            raise PasswordPolicyError("The policy does not allow any characters.")
+
+        self.min_length = sum(minimum for _, _, minimum in self.classes)
+        self.characters = ''.join(characters for _, characters, _ in self.classes)
+        # Classes without a minimum only restrict the allowed characters, so sampling treats them as one group
+        free = ''.join(characters for _, characters, minimum in self.classes if minimum == 0)
+        self._groups = [(characters, minimum) for _, characters, minimum in self.classes if minimum > 0]
+        if free:
+            self._groups.append((free, 0))
+        self._tables = {}  # length -> (totals, cumulative weights), see _composition_tables
+        self._rejection = {}  # length -> whether draws_whole_passwords()
+
+    def check(self, length):
+        """
+        Check that passwords of the given length can satisfy the policy.
+
+        :param length: Length of the passwords.
+        :raises PasswordLengthError: If the length is not a positive integer.
+        :raises PasswordPolicyError: If the minimums add up to more than the length.
+        """
+        if length <= 0:
+            raise PasswordLengthError("Password length must be a positive integer.")
+        if length < self.min_length:
+            raise PasswordPolicyError(
+                f"The policy requires at least {self.min_length} characters, but the length is {length}.")
+
+    def accepts(self, password):
+        """
+        Check whether a password satisfies the policy.
+
+        :param password: The password to check.
+        :return: True if every character is allowed and every class minimum is met.
+        """
+        remaining = len(password)
+        for _, characters, minimum in self.classes:
+            count = sum(map(password.count, characters))
+            if count < minimum:
+                return False
+            remaining -= count
+        return remaining == 0
+
+    def draws_whole_passwords(self, length):
+        """
+        Tell whether passwords of this length are best drawn whole from all allowed characters, retrying
+        until one meets the minimums, rather than built from a sampled composition.
+
+        Both ways yield every valid password equally often. Drawing whole passwords is chosen when a union
+        bound shows that at least REJECTION_MIN_ACCEPTANCE of the draws pass, as for long passwords with
+        small minimums, where building the composition tables would take time cubic in the length.
+
+        :param length: Length of the password; must have passed check().
+        :return: True if passwords should be drawn whole.
+        """
+        if length not in self._rejection:
+            missed = 0.0  # Bound on the probability that a drawn password misses some minimum
+            for characters, minimum in self._groups:
+                share = len(characters) / len(self.characters)
+                if minimum == 0 or share == 1:
+                    continue
+                # P(Binomial(length, share) < minimum), summed in log space to avoid huge integers
+                missed += sum(math.exp(math.lgamma(length + 1) - math.lgamma(count + 1)
+                                       - math.lgamma(length - count + 1)
+                                       + count * math.log(share) + (length - count) * math.log1p(-share))
+                              for count in range(minimum))
+            self._remember(self._rejection, length, 1 - missed >= REJECTION_MIN_ACCEPTANCE)
+        return self._rejection[length]
+
+    def sample_composition(self, length, randbelow=secrets.randbelow):
+        """
+        Choose how many characters each group of character classes contributes to a password.
+
+        Each composition is chosen with probability proportional to the number of valid passwords that
+        have it, so filling the groups uniformly and shuffling yields every valid password equally often.
+
+        :param length: Length of the password; must have passed check().
+        :param randbelow: Function returning a uniform random integer in [0, bound).
+        :return: List of (characters, count) pairs whose counts add up to the length.
+        """
+        totals, rows = self._composition_tables(length)
+        composition = []
+        remaining = length
+        for index, (characters, minimum) in enumerate(self._groups):
+            if index == len(self._groups) - 1:
+                count = remaining  # The last group takes the positions that are left
+            else:
+                if (index, remaining) not in rows:
+                    rows[index, remaining] = list(itertools.accumulate(self._terms(index, remaining, totals)))
+                cumulative = rows[index, remaining]
+                count = minimum + bisect.bisect_right(cumulative, randbelow(cumulative[-1]))
+            composition.append((characters, count))
+            remaining -= count
+        return composition
+
+    def _composition_tables(self, length):
+        # totals[k][r] is the number of strings of r characters from groups k onwards that meet the minimums
+        # of those groups. Group 0 is only ever sampled at the full length, so its row is not needed.
+        if length not in self._tables:
+            characters, minimum = self._groups[-1]
+            totals = [None] * len(self._groups)
+            totals[-1] = [len(characters) ** remaining if remaining >= minimum else 0
+                          for remaining in range(length + 1)]
+            for index in range(len(self._groups) - 2, 0, -1):
+                totals[index] = [sum(self._terms(index, remaining, totals)) for remaining in range(length + 1)]
+            self._remember(self._tables, length, (totals, {}))
+        return self._tables[length]
+
+    def _remember(self, cache, length, value):
+        # Keep at most POLICY_CACHE_LENGTHS lengths per cache, dropping the oldest first
+        if len(cache) >= POLICY_CACHE_LENGTHS:
+            del cache[next(iter(cache))]
+        cache[length] = value
+
+    def _terms(self, index, remaining, totals):
+        # For count = minimum, minimum + 1, ..., yield the number of strings of `remaining` characters from
+        # groups index onwards in which group index fills exactly count positions:
+        # C(remaining, count) * size ** count * totals[index + 1][remaining - count]
+        characters, minimum = self._groups[index]
+        size = len(characters)
+        following = totals[index + 1]
+        ways = math.comb(remaining, minimum) * size ** minimum
+        for count in range(minimum, remaining + 1):
+            yield ways * following[remaining - count]
+            ways = ways * (remaining - count) * size // (count + 1)
 
 class PasswordGenerator:
     def __init__(self):
         """Initialize PasswordGenerator with CharacterLake for password creation."""
         self.character_lake = CharacterLake()
+        self.secure_policy = PasswordPolicy(min_digits=SECURE_MIN_DIGITS, min_special=SECURE_MIN_SPECIAL)
+        self._pools = {}  # Character set -> EntropyPool, see _pool
+        self._indices = RandomIndexSource()  # Composition choices and shuffles of policy passwords
 
     def generate_password(self, length, secure=False):
         """
@@ -86,14 +404,107 @@ class PasswordGenerator:
         
         :param length: Length of the password to be generated.
         :return: The generated secure password as a string.
+        :raises PasswordPolicyError: If the length is too short for the criteria.
         """
-        digits = self.character_lake.digits
-        special_chars = self.character_lake.special_chars
+        return self.generate_policy_password(length, self.secure_policy)
 
-        while True:
-            password = self.generate_password(length, secure=True)
-            if (any(char in special_chars for char in password) and sum(char in digits for char in password) >= 5):
-                return password
+    def generate_policy_password(self, length, policy):
+        """
+        Generate a password that satisfies a policy, chosen uniformly among all passwords that do.
+
+        The required characters are placed constructively and then shuffled, so the time taken does not
+        depend on how likely a random password would be to satisfy the policy. Passwords that nearly always
+        satisfy it by chance, such as long ones with small minimums, are drawn whole and redrawn if they
+        do not (see PasswordPolicy.draws_whole_passwords).
+
+        :param length: Length of the password to be generated.
+        :param policy: The PasswordPolicy to satisfy.
+        :return: The generated password as a string.
+        :raises PasswordLengthError: If the length is not a positive integer.
+        :raises PasswordPolicyError: If no password of this length can satisfy the policy.
+        """
+        policy.check(length)
+        return self._sample_policy_password(length, policy)
+
+    def is_secure(self, password):
+        """
+        Check whether a password meets the criteria of a secure password.
+
+        :param password: The password to check.
+        :return: True if the password has at least one special character and at least five digits.
+        """
+        return self.secure_policy.accepts(password)
+
+    def generate_many(self, count, length, policy='normal', output=None, batch_size=DEFAULT_GENERATE_BATCH):
+        """
+        Generate many passwords from buffered os.urandom entropy.
+
+        Characters are drawn in large blocks through an EntropyPool rather than one secrets.choice
+        call per character; NumPy is used to map the blocks when it is installed.
+
+        :param count: Number of passwords to generate.
+        :param length: Length of each password.
+        :param policy: 'normal' for random characters, 'secure' for passwords that pass is_secure,
+                       or a PasswordPolicy.
+        :param output: Optional path or writable text file; each password is written on its own line.
+        :param batch_size: Number of passwords generated per batch.
+        :return: An iterator over the passwords, or the number of passwords written if output is given.
+        :raises PasswordLengthError: If the count or length is invalid.
+        :raises PasswordCategoryError: If the policy is unknown.
+        :raises PasswordPolicyError: If no password of this length can satisfy the policy.
+        """
+        if policy == 'secure':
+            policy = self.secure_policy
+        elif not isinstance(policy, PasswordPolicy) and policy not in PASSWORD_POLICIES:
+            raise PasswordCategoryError(f"Unknown password policy: {policy}. Choose from {', '.join(PASSWORD_POLICIES)}.")
+        if count < 0:
+            raise PasswordLengthError("The number of passwords must not be negative.")
+        if length <= 0:
+            raise PasswordLengthError("Password length must be a positive integer.")
+        if isinstance(policy, PasswordPolicy):
+            policy.check(length)
+
+        batches = self._generate_batches(count, length, policy, max(1, batch_size))
+        if output is None:
+            return itertools.chain.from_iterable(batches)
+        return write_passwords(output, batches)
+
+    def _generate_batches(self, count, length, policy, batch_size):
+        # Yield lists of passwords until count passwords have been produced
+        pool = self._pool(self.character_lake.get_characters())
+        remaining = count
+        while remaining > 0:
+            batch = min(batch_size, remaining)
+            if isinstance(policy, PasswordPolicy):
+                passwords = [self._sample_policy_password(length, policy) for _ in range(batch)]
+            else:
+                text = pool.read(batch * length)
+                passwords = [text[start:start + length] for start in range(0, len(text), length)]
+            remaining -= batch
+            yield passwords
+
+    def _sample_policy_password(self, length, policy):
+        if policy.draws_whole_passwords(length):
+            # Every allowed password is equally likely to be drawn, so the first one that passes is uniform
+            pool = self._pool(policy.characters)
+            while True:
+                password = pool.read(length)
+                if policy.accepts(password):
+                    return password
+
+        # Fill each group with its share of uniformly drawn characters, then shuffle the positions
+        characters = []
+        for group_characters, count in policy.sample_composition(length, self._indices.below):
+            if count:
+                characters.extend(self._pool(group_characters).read(count))
+        self._indices.shuffle(characters)
+        return ''.join(characters)
+
+    def _pool(self, characters):
+        # One EntropyPool per character set, so leftover entropy carries over between calls
+        if characters not in self._pools:
+            self._pools[characters] = EntropyPool(characters)
+        return self._pools[characters]
 
     @staticmethod
     def get_pwd_length():
@@ -184,6 +595,9 @@ class PasswordGenerator:
         except PasswordLengthError as ple:
             print(f"Error with password length: {ple.message}")
             sys.exit(1)
+        except PasswordPolicyError as ppe:
+            print(f"Error with password policy: {ppe.message}")
+            sys.exit(1)
         except InvalidInputError as iie:
             print(f"Invalid input: {iie.message}")
             sys.exit(1)
@@ -196,6 +610,98 @@ class PasswordGenerator:
 
         return password
 
+def write_passwords(output, batches):
+    """
+    Write batches of passwords to a file, one password per line.
+
+    :param output: Path of the file (created with owner-only permissions) or a writable text file.
+    :param batches: Iterable of lists of passwords.
+    :return: The number of passwords written.
+    """
+    if hasattr(output, 'write'):
+        written = 0
+        for passwords in batches:
+            output.write('\n'.join(passwords) + '\n')
+            written += len(passwords)
+        return written
+
+    descriptor = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with open(descriptor, 'w', encoding='utf-8', newline='\n') as file:
+        return write_passwords(file, batches)
+
+def parse_arguments(argv):
+    """
+    Parse the command-line arguments of the non-interactive modes.
+
+    :param argv: Arguments without the program name.
+    :return: argparse.Namespace with the selected command and its options.
+    """
+    parser = argparse.ArgumentParser(usage="python password_wizard.py <command> [options]")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    bulk = commands.add_parser('bulk', help="generate many passwords, one per line")
+    bulk.add_argument('--count', type=int, required=True, help="number of passwords to generate")
+    bulk.add_argument('--length', type=int, required=True, help="length of each password")
+    bulk.add_argument('--policy', choices=PASSWORD_POLICIES, default='normal', help="(default: normal)")
+    bulk.add_argument('--output', help="file the passwords are written to (default: standard output)")
+    for name in ['lower', 'upper', 'digits', 'special']:
+        bulk.add_argument(f'--min-{name}', type=int, default=None,
+                          help=f"minimum number of {name} characters (implies a custom policy)")
+    bulk.add_argument('--special', default=None, help="allowed special characters (default: all punctuation)")
+    bulk.add_argument('--exclude', default='', help="characters that must not appear")
+    bulk.add_argument('--no-ambiguous', action='store_true', help=f"exclude the ambiguous characters {AMBIGUOUS_CHARS}")
+    return parser.parse_args(argv)
+
+def policy_from_arguments(args):
+    """
+    Build the policy selected by the bulk command's options.
+
+    :param args: argparse.Namespace of the bulk command.
+    :return: 'normal', or a PasswordPolicy when the secure policy or any character option is selected.
+    """
+    minimums = {'min_lower': args.min_lower, 'min_upper': args.min_upper,
+                'min_digits': args.min_digits, 'min_special': args.min_special}
+    custom = any(value is not None for value in minimums.values())
+    if args.policy == 'normal' and not (custom or args.special is not None or args.exclude or args.no_ambiguous):
+        return 'normal'
+
+    if args.policy == 'secure':  # Explicit minimums override the secure defaults
+        minimums['min_digits'] = SECURE_MIN_DIGITS if args.min_digits is None else args.min_digits
+        minimums['min_special'] = SECURE_MIN_SPECIAL if args.min_special is None else args.min_special
+    minimums = {key: value or 0 for key, value in minimums.items()}
+    return PasswordPolicy(special=args.special, exclude=args.exclude, exclude_ambiguous=args.no_ambiguous, **minimums)
+
+def command_line_mode(argv):
+    """
+    Run a non-interactive mode selected by command-line arguments.
+
+    :param argv: Arguments without the program name.
+    """
+    try:
+        args = parse_arguments(argv)
+        if args.command == 'bulk':
+            generator = PasswordGenerator()
+            policy = policy_from_arguments(args)
+            generator.generate_many(args.count, args.length, policy, args.output or sys.stdout)
+    except KeyboardInterrupt:
+        print("\nProcess interrupted by the user.")
+        sys.exit(1)
+    except PasswordLengthError as ple:
+        print(f"Error with password length: {ple.message}")
+        sys.exit(1)
+    except PasswordCategoryError as pce:
+        print(f"Error with password category: {pce.message}")
+        sys.exit(1)
+    except PasswordPolicyError as ppe:
+        print(f"Error with password policy: {ppe.message}")
+        sys.exit(1)
+    except PasswordGeneratorError as pge:
+        print(f'Error processing password: {pge.message}')
+        sys.exit(1)
+    except OSError as e:
+        print(f'Error writing passwords: {e}')
+        sys.exit(1)
+
 def main():
     """
     Main function to run the password generation wizard and display the generated password.
@@ -216,6 +722,9 @@ def main():
         except PasswordCategoryError as pce:
             print(f"Error with password category: {pce.message}")
             sys.exit(1)
+        except PasswordPolicyError as ppe:
+            print(f"Error with password policy: {ppe.message}")
+            sys.exit(1)
         except PasswordGeneratorError as pge:
             print(f'Error processing password: {pge.message}')
             sys.exit(1)
@@ -224,5 +733,8 @@ def main():
             sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1:
+        command_line_mode(sys.argv[1:])
+    else:
+        main()
     sys.exit(0)
\ No newline at end of file
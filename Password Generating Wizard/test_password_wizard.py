@@ -0,0 +1,53 @@
+import itertools
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from password_wizard import POLICY_CACHE_LENGTHS, PasswordGenerator, PasswordPolicy
+
+
+class PasswordPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.generator = PasswordGenerator()
+
+    def test_long_policy_passwords_are_fast(self):
+        """A policy with small minimums must not build tables whose cost grows with the cube of the length."""
+        policy = PasswordPolicy(min_lower=1, min_upper=1, min_digits=1, min_special=1)
+        for length in (4096, 8192):
+            start = time.perf_counter()
+            passwords = list(self.generator.generate_many(5, length, policy))
+            passwords.append(self.generator.generate_secure_password(length))
+            self.assertLess(time.perf_counter() - start, 2.0)
+            self.assertTrue(all(len(password) == length and policy.accepts(password) for password in passwords[:5]))
+            self.assertTrue(self.generator.is_secure(passwords[-1]))
+
+    def test_short_policy_passwords_meet_minimums(self):
+        policy = PasswordPolicy(min_lower=2, min_upper=2, min_digits=2, min_special=2, exclude_ambiguous=True)
+        self.assertFalse(policy.draws_whole_passwords(8))
+        for password in self.generator.generate_many(500, 8, policy):
+            self.assertTrue(policy.accepts(password))
+
+    def test_every_valid_password_can_be_drawn(self):
+        # One tiny policy per way of sampling; each must reach every valid password
+        cases = (('abc', '01', '#', {'min_lower': 1, 'min_digits': 2}, 4, False),
+                 ('ab', '01', '', {'min_lower': 1, 'min_digits': 1}, 6, True))
+        for lower, digits, special, minimums, length, whole in cases:
+            policy = PasswordPolicy(lower=lower, upper='', digits=digits, special=special, **minimums)
+            self.assertEqual(policy.draws_whole_passwords(length), whole)
+            valid = {''.join(chars) for chars in itertools.product(policy.characters, repeat=length)
+                     if policy.accepts(''.join(chars))}
+            drawn = {self.generator.generate_policy_password(length, policy) for _ in range(40 * len(valid))}
+            self.assertEqual(drawn, valid)
+
+    def test_table_cache_is_bounded(self):
+        policy = PasswordPolicy(min_digits=3, min_special=3)
+        for length in range(6, 6 + 3 * POLICY_CACHE_LENGTHS):
+            policy.sample_composition(length)
+        self.assertLessEqual(len(policy._tables), POLICY_CACHE_LENGTHS)
+
+
+if __name__ == '__main__':
+    unittest.main()